@@ -0,0 +1,83 @@
+"""Local stand-in for DuckDuckGo's HTML endpoint and the guide pages it links to.
+
+``/html/?q=...`` returns a deterministic result list pointing back at this
+server's ``/guide/<n>`` pages, which support ETag revalidation like real sites.
+"""
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+TOPICS = ["boss strategy", "map secrets", "charm locations", "quest walkthrough", "upgrade materials"]
+
+
+def guide_html(page: int) -> str:
+    topic = TOPICS[page % len(TOPICS)]
+    sentences = " ".join(
+        f"<p>Step {i}: for the {topic} head past the checkpoint, use the dash ability and "
+        f"collect the key before fighting the boss near the old tower.</p>"
+        for i in range(1, 60)
+    )
+    return (
+        f"<html><head><title>Guide {page}: {topic}</title><script>var x = 1;</script></head>"
+        f"<body><nav>Home | Wiki | Forums</nav><article><h1>{topic.title()} guide</h1>{sentences}</article>"
+        f"<footer>Copyright</footer></body></html>"
+    )
+
+
+class StubWebHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        parts = urlsplit(self.path)
+        if parts.path.rstrip("/") == "/html":
+            query = parse_qs(parts.query).get("q", [""])[0]
+            self._send(self._results(query), "text/html")
+        elif parts.path.startswith("/guide/"):
+            page = int(parts.path.rsplit("/", 1)[-1] or 0)
+            body = guide_html(page)
+            etag = '"' + hashlib.md5(body.encode("utf-8")).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self._send(body, "text/html; charset=utf-8", {"ETag": etag})
+        else:
+            self.send_error(404)
+
+    def _results(self, query: str) -> str:
+        host = f"http://{self.headers.get('Host')}"
+        digest = int(hashlib.sha256(query.encode("utf-8")).hexdigest(), 16)
+        links = []
+        for i in range(5):
+            page = (digest + i) % 20
+            url = quote(f"{host}/guide/{page}", safe="")
+            links.append(
+                f'<a class="result__a" href="/l/?uddg={url}&rut=x">Guide {page}: {TOPICS[page % len(TOPICS)]}</a>'
+                f'<a class="result__snippet" href="#">Snippet {page}</a>'
+            )
+        return "<html><body>" + "".join(links) + "</body></html>"
+
+    def _send(self, body: str, content_type: str, headers: dict = None):
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stub_web(latency: float = 0.0) -> ThreadingHTTPServer:
+    handler = type("ConfiguredStubWebHandler", (StubWebHandler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="stub-web", daemon=True).start()
+    return server
@@ -1,6 +1,7 @@
 class GameAssistant {
     constructor() {
         this.isProcessing = false;
+        this.streamingText = '';
         this.settings = {};
         this.init();
     }
@@ -105,12 +106,45 @@ class GameAssistant {
         window.electronAPI.onOpenSettings(() => {
             this.showSettings();
         });
+
+        // Render the answer incrementally while the query is streaming
+        window.electronAPI.onQueryChunk((event, chunk) => {
+            if (!this.isProcessing) return;
+            this.streamingText += chunk;
+            this.showResponse(this.streamingText);
+        });
+
+        // Results pushed by the backend without a request
+        window.electronAPI.onBackendEvent((event, { type, data }) => {
+            this.handleBackendEvent(type, data);
+        });
+    }
+
+    handleBackendEvent(type, data) {
+        switch (type) {
+            case 'hello':
+            case 'game_detected':
+                if (data.current_game || data.game) {
+                    this.updateStatus(`Playing: ${data.current_game || data.game}`, 'ready');
+                }
+                break;
+            case 'analysis':
+                // Don't clobber an answer the user is waiting on
+                if (!this.isProcessing) {
+                    const header = data.game ? `🎮 ${data.game}\n\n` : '';
+                    this.showResponse(`${header}${data.response}`);
+                }
+                break;
+            default:
+                break;
+        }
     }
 
     async processQuery(query) {
         if (!query || this.isProcessing) return;
 
         this.isProcessing = true;
+        this.streamingText = '';
         this.updateStatus('Processing...', 'processing');
         this.showResponse('Thinking...');
 
@@ -148,13 +182,7 @@ class GameAssistant {
             } else {
                 this.updateStatus('Screenshot captured', 'ready');
                 this.showResponse('Screenshot captured successfully!');
-                
-                // Auto-analyze if we have an AI key
-                if (this.settings.openaiApiKey) {
-                    setTimeout(() => {
-                        this.processQuery('What game is this and what am I currently doing?');
-                    }, 1000);
-                }
+                // The backend analyzes the capture and pushes the result as an 'analysis' event
             }
         } catch (error) {
             console.error('Screenshot error:', error);
@@ -227,7 +255,14 @@ class GameAssistant {
         };
 
         try {
-            await window.electronAPI.updateSettings(newSettings);
+            const result = await window.electronAPI.updateSettings(newSettings);
+            if (result && result.success === false) {
+                const details = Object.entries(result.errors || {})
+                    .map(([name, message]) => `${name}: ${message}`)
+                    .join('\n');
+                this.showResponse(`Settings not saved: ${details || result.error}`);
+                return;
+            }
             this.settings = { ...this.settings, ...newSettings };
             this.hideSettings();
             this.showResponse('Settings saved successfully!');
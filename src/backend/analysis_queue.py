@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from resilience import deadline_scope
+
+
+@dataclass
+class AnalysisJob:
+    """One unit of background analysis.
+
+    ``run`` receives the job itself and should check ``expired()`` before
+    slow steps and before publishing results.
+    """
+    purpose: str
+    run: Callable[["AnalysisJob"], None]
+    timeout: float
+    submitted: float = field(default_factory=time.monotonic)
+    started: Optional[float] = None
+
+    @property
+    def deadline(self) -> float:
+        return self.submitted + self.timeout
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+
+class AnalysisQueue:
+    """A fixed pool of workers for background screenshot analysis.
+
+    At most one job per purpose waits in the queue: submitting a newer job
+    supersedes the queued one, so a burst of hotkey presses costs one
+    analysis of the latest frame rather than one per press. Jobs of the same
+    purpose never run concurrently, so their results are applied in order;
+    more than one worker only helps once several purposes are submitted.
+    """
+
+    def __init__(self, workers: int, job_timeout: float, max_pending: int):
+        self.workers = max(1, workers)
+        self.job_timeout = job_timeout
+        self.max_pending = max(1, max_pending)
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[str, AnalysisJob]" = OrderedDict()
+        self._running: Dict[str, AnalysisJob] = {}
+        self._stopped = False
+        self._started_at = time.monotonic()
+        self._busy_seconds = 0.0
+        self.submitted = 0
+        self.completed = 0
+        self.superseded = 0
+        self.timed_out = 0
+        self.failed = 0
+        self.rejected = 0
+
+        self._threads: List[threading.Thread] = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"analysis-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, purpose: str, run: Callable[[AnalysisJob], None],
+               timeout: Optional[float] = None) -> bool:
+        """Queue a job, replacing any queued job with the same purpose.
+
+        Returns False if the queue is full or shut down.
+        """
+        job = AnalysisJob(purpose=purpose, run=run, timeout=self.job_timeout if timeout is None else timeout)
+        with self._cond:
+            if self._stopped:
+                return False
+            if purpose in self._pending:
+                # Keep the queue position, swap in the newer frame
+                self._pending[purpose] = job
+                self.superseded += 1
+            elif len(self._pending) >= self.max_pending:
+                self.rejected += 1
+                return False
+            else:
+                self._pending[purpose] = job
+            self.submitted += 1
+            self._cond.notify()
+            return True
+
+    def _next_job(self) -> Optional[AnalysisJob]:
+        """Oldest queued job whose purpose isn't already running. Caller holds the lock."""
+        for purpose, job in self._pending.items():
+            if purpose not in self._running:
+                del self._pending[purpose]
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._stopped:
+                    job = self._next_job()
+                    if job:
+                        break
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                job.started = time.monotonic()
+                # A job that sat in the queue past its timeout is no longer worth running
+                if job.expired():
+                    self.timed_out += 1
+                    continue
+                self._running[job.purpose] = job
+
+            failed = False
+            try:
+                # The job's timeout also bounds the network calls it makes
+                with deadline_scope(job.deadline):
+                    job.run(job)
+            except Exception as e:
+                failed = True
+                print(f"Analysis job '{job.purpose}' failed: {e}")
+
+            with self._cond:
+                del self._running[job.purpose]
+                self._busy_seconds += time.monotonic() - job.started
+                if failed:
+                    self.failed += 1
+                elif job.expired():
+                    self.timed_out += 1
+                else:
+                    self.completed += 1
+                # A queued job of the same purpose may now run
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            busy = self._busy_seconds + sum(now - job.started for job in self._running.values())
+            uptime = max(now - self._started_at, 1e-6)
+            return {
+                'workers': self.workers,
+                'busy': len(self._running),
+                'queue_depth': len(self._pending),
+                'utilization': round(busy / (uptime * self.workers), 4),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'superseded': self.superseded,
+                'timed_out': self.timed_out,
+                'failed': self.failed,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self):
+        with self._cond:
+            self._stopped = True
+            self._pending.clear()
+            self._cond.notify_all()
@@ -1,114 +1,448 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+import queue
 import threading
 import time
 import os
 import sys
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 # Add current directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from config import config
-from screenshot_manager import ScreenshotManager
-from llm_processor import LLMProcessor
-from web_searcher import WebSearcher
+from analysis_queue import AnalysisJob, AnalysisQueue
+from concurrency import FairLimiter
+from config import RESTART_REQUIRED, ConfigError, config
+from conversation import ConversationStore
+from events import EventBroadcaster, format_sse
+from metrics import metrics
+from query_planner import QueryPlanner, StrategyResult
+from resilience import StreamInterrupted, deadline_scope, remaining_budget
+from startup import StartupSequence, SubsystemUnavailable
+
+# Modules that pull in OpenCV/NumPy or open devices are imported by the
+# subsystem init functions, after the HTTP server is already answering
+if TYPE_CHECKING:
+    from frame_buffer import Frame
+    from screen_text import ScreenText
+
+# Strategies that read the screen; web search and text-only answers only back them up
+SCREEN_STRATEGIES = ('ocr', 'temporal', 'vision')
 
 class BackendServer:
     def __init__(self):
         self.app = Flask(__name__)
-        CORS(self.app)
+        # Any web page could otherwise drive the API, e.g. POST /config; see _check_origin
+        CORS(self.app, origins=config.CORS_ORIGINS)
+        self.app.before_request(self._check_origin)
         
-        # Initialize components
-        self.screenshot_manager = ScreenshotManager()
+        # Initialize components; the heavy ones are set by the startup sequence below
+        self.events = EventBroadcaster()
+        self.screenshot_manager = None
         self.llm_processor = None
-        self.web_searcher = WebSearcher()
+        self.web_searcher = None
+        self.game_identifier = None
+        self.screen_text = None
         self.current_game = None
+        self._last_analyzed_hash: Optional[int] = None
+        # (game, response) of the last vision analysis, replayed when a capture needs no new one
+        self._last_analysis: Optional[Tuple[Optional[str], str]] = None
+        # Bounds how many queries hit the LLM/search backends at once
+        self.query_limiter = FairLimiter(config.MAX_CONCURRENT_QUERIES)
+        # Each query fans out to up to four strategies (OCR, vision, web, text)
+        self.query_planner = QueryPlanner(
+            max_workers=config.MAX_CONCURRENT_QUERIES * 4,
+            grace=config.QUERY_PREFERENCE_GRACE
+        )
+        # Background auto-analysis; bursts of captures coalesce to the newest frame
+        self.analysis_queue = AnalysisQueue(
+            workers=config.ANALYSIS_WORKERS,
+            job_timeout=config.ANALYSIS_JOB_TIMEOUT,
+            max_pending=config.ANALYSIS_MAX_PENDING
+        )
+        # Per-session history; old turns are summarized once the LLM is up
+        self.conversations = ConversationStore(
+            token_budget=config.SESSION_TOKEN_BUDGET,
+            recent_turns=config.SESSION_RECENT_TURNS,
+            summary_max_tokens=config.SESSION_SUMMARY_MAX_TOKENS,
+            max_sessions=config.MAX_SESSIONS
+        )
         
-        # Try to initialize LLM processor
-        try:
-            self.llm_processor = LLMProcessor()
-            print("✅ LLM processor initialized successfully")
-        except ValueError as e:
-            print(f"⚠️  LLM processor disabled: {e}")
+        # Queries need capture and search first; OCR and game identification only speed things up
+        self.startup = StartupSequence()
+        self.startup.add('capture', self._init_capture)
+        self.startup.add('llm', self._init_llm, required=False)
+        self.startup.add('search', self._init_search)
+        self.startup.add('ocr', self._init_ocr, required=False)
+        self.startup.add('game_identifier', self._init_game_identifier, required=False)
         
-        # Start screenshot capture
-        self.screenshot_manager.start_continuous_capture()
+        self._register_gauges()
+        config.subscribe(self._apply_config)
         
         # Setup routes
         self.setup_routes()
+        
+        if config.LAZY_STARTUP:
+            # /health answers right away and reports each subsystem as it comes up
+            self.startup.start()
+        else:
+            self.startup.run()
+    
+    def _init_capture(self):
+        from screenshot_manager import ScreenshotManager
+        manager = ScreenshotManager()
+        manager.capture_listeners.append(self._publish_capture)
+        manager.start_continuous_capture()
+        self.screenshot_manager = manager
+    
+    def _init_llm(self):
+        from llm_processor import LLMProcessor
+        try:
+            processor = LLMProcessor()
+        except ValueError as e:
+            raise SubsystemUnavailable(e)
+        print(f"✅ LLM processor initialized ({processor.provider.name} at {processor.provider.base_url})")
+        self.conversations.summarizer = processor.summarize_conversation
+        self.llm_processor = processor
+    
+    def _init_search(self):
+        from web_searcher import WebSearcher
+        self.web_searcher = WebSearcher()
+    
+    def _init_ocr(self):
+        if not config.OCR_ENABLED:
+            raise SubsystemUnavailable("OCR_ENABLED is off")
+        from screen_text import ScreenTextReader
+        reader = ScreenTextReader(
+            config.TESSERACT_CMD,
+            language=config.OCR_LANGUAGE,
+            timeout=config.OCR_TIMEOUT,
+            cache_size=config.OCR_CACHE_SIZE
+        )
+        if not reader.available:
+            raise SubsystemUnavailable("Tesseract not found, text questions use the vision model")
+        self.screen_text = reader
+    
+    def _init_game_identifier(self):
+        from game_identifier import GameIdentifier
+        # Cheap local identification; the vision model is only asked when it's unsure
+        self.game_identifier = GameIdentifier(
+            os.path.join(config.CACHE_DIR, "game_signatures.sqlite3"),
+            features=config.GAME_ID_FEATURES,
+            signatures_per_game=config.GAME_SIGNATURES_PER_GAME,
+            min_matches=config.GAME_ID_MIN_MATCHES,
+            min_score=config.GAME_ID_MIN_SCORE,
+            margin=config.GAME_ID_MARGIN
+        )
+    
+    def _apply_config(self, changed: Dict[str, Any]):
+        """Push settings changed at runtime into components that copied them at startup."""
+        if 'MAX_CONCURRENT_QUERIES' in changed:
+            self.query_limiter.set_limit(config.MAX_CONCURRENT_QUERIES)
+        if 'QUERY_PREFERENCE_GRACE' in changed:
+            self.query_planner.grace = config.QUERY_PREFERENCE_GRACE
+        if changed.keys() & {'ANALYSIS_JOB_TIMEOUT', 'ANALYSIS_MAX_PENDING'}:
+            self.analysis_queue.job_timeout = config.ANALYSIS_JOB_TIMEOUT
+            self.analysis_queue.max_pending = config.ANALYSIS_MAX_PENDING
+        if changed.keys() & {'SESSION_TOKEN_BUDGET', 'SESSION_RECENT_TURNS', 'SESSION_SUMMARY_MAX_TOKENS', 'MAX_SESSIONS'}:
+            self.conversations.token_budget = config.SESSION_TOKEN_BUDGET
+            self.conversations.recent_turns = config.SESSION_RECENT_TURNS
+            self.conversations.summary_max_tokens = config.SESSION_SUMMARY_MAX_TOKENS
+            self.conversations.max_sessions = config.MAX_SESSIONS
+        
+        if self.screenshot_manager:
+            self.screenshot_manager.apply_config(changed)
+        if self.llm_processor:
+            self.llm_processor.apply_config(changed)
+        if self.web_searcher:
+            self.web_searcher.apply_config(changed)
+        if changed.get('OCR_ENABLED') and not self.screen_text:
+            try:
+                self._init_ocr()
+            except SubsystemUnavailable as e:
+                print(f"⚠️  OCR still disabled: {e}")
+        if self.screen_text:
+            self.screen_text.timeout = config.OCR_TIMEOUT
+            self.screen_text.cache_size = config.OCR_CACHE_SIZE
+            if 'OCR_LANGUAGE' in changed:
+                self.screen_text.language = config.OCR_LANGUAGE
+                self.screen_text.clear_cache()
+        if self.game_identifier:
+            self.game_identifier.min_matches = config.GAME_ID_MIN_MATCHES
+            self.game_identifier.min_score = config.GAME_ID_MIN_SCORE
+            self.game_identifier.margin = config.GAME_ID_MARGIN
+            self.game_identifier.signatures_per_game = config.GAME_SIGNATURES_PER_GAME
+        
+        # Let overlays reflect settings changed by another client
+        self.events.publish('config', {'changed': changed})
+    
+    def _check_origin(self):
+        """Reject browser requests from origins not listed in CORS_ORIGINS.
+        
+        CORS alone only hides responses; the request would still run.
+        """
+        origin = request.headers.get('Origin')
+        if origin and origin not in config.CORS_ORIGINS:
+            return jsonify({'error': 'Origin not allowed'}), 403
+        return None
+    
+    def _query_request_error(self, data: Any) -> Optional[str]:
+        """Why a /query body is malformed, or None if it is usable."""
+        if not isinstance(data, dict):
+            return 'Expected a JSON object'
+        query = data.get('query', '')
+        if not isinstance(query, str):
+            return "'query' must be a string"
+        if not query.strip():
+            return 'Empty query'
+        regions = data.get('regions')
+        if regions is not None:
+            if not isinstance(regions, list) or not all(isinstance(name, str) for name in regions):
+                return "'regions' must be a list of region names"
+            unknown = [name for name in regions if name != 'auto' and name not in config.ROI_REGIONS]
+            if unknown:
+                return f"Unknown regions: {', '.join(unknown)}"
+        session_id = data.get('session_id')
+        if session_id is not None and not isinstance(session_id, str):
+            return "'session_id' must be a string"
+        return None
+    
+    def _await_subsystems(self, *names: str) -> bool:
+        """Wait for the subsystems a request needs to finish starting; False on timeout."""
+        return self.startup.wait_all(config.STARTUP_WAIT_TIMEOUT, list(names))
+    
+    def _capture_for_query(self) -> Optional["Frame"]:
+        if not self.screenshot_manager:
+            return None
+        return self.screenshot_manager.capture_if_stale(config.QUERY_CAPTURE_MAX_AGE)
     
     def setup_routes(self):
         @self.app.route('/health', methods=['GET'])
         def health_check():
-            return jsonify({'status': 'healthy', 'llm_enabled': self.llm_processor is not None})
+            breakers = {}
+            if self.web_searcher:
+                breakers['search'] = self.web_searcher.breaker.snapshot()
+            if self.llm_processor:
+                breakers['llm'] = self.llm_processor.breaker.snapshot()
+            if not self.startup.settled:
+                status = 'starting'
+            elif not self.startup.ready or any(b['state'] != 'closed' for b in breakers.values()):
+                status = 'degraded'
+            else:
+                status = 'healthy'
+            return jsonify({
+                'status': status,
+                'ready': self.startup.ready,
+                'llm_enabled': self.llm_processor is not None,
+                'subsystems': self.startup.snapshot(),
+                'breakers': breakers
+            })
         
         @self.app.route('/query', methods=['POST'])
         def handle_query():
+            data = request.get_json(silent=True)
+            error = self._query_request_error(data)
+            if error:
+                return jsonify({'error': error}), 400
+            query = data['query'].strip()
+            regions = data.get('regions')
+            session_id = data.get('session_id') or 'default'
+            
+            if not self._await_subsystems('capture', 'llm', 'search'):
+                return jsonify({'error': 'Backend is still starting, try again shortly'}), 503
+            
+            if not self.query_limiter.acquire(timeout=config.QUERY_QUEUE_TIMEOUT):
+                return jsonify({'error': 'Server busy, try again shortly'}), 503
             try:
-                data = request.get_json()
-                query = data.get('query', '').strip()
-                
-                if not query:
-                    return jsonify({'error': 'Empty query'}), 400
-                
                 print(f"Processing query: {query}")
+                history = self.conversations.history(session_id)
                 
-                # Get latest screenshot for context
-                screenshot_path = self.screenshot_manager.get_screenshot_for_analysis()
-                
-                response = None
-                
-                # Try LLM analysis with screenshot first
-                if self.llm_processor and screenshot_path:
-                    print("🤖 Analyzing with AI...")
-                    response = self.llm_processor.analyze_screenshot(screenshot_path, query)
-                
-                # If screenshot analysis fails or no LLM, try web search
-                if not response:
-                    print("🔍 Searching web...")
-                    search_results = self.web_searcher.search_game_hints(query, self.current_game)
+                with metrics.span("query"):
+                    # Get a fresh screenshot for context
+                    frame = self._capture_for_query()
+                    key_frames = self._key_frames(query, frame, data.get('temporal'))
+                    read_text = not key_frames and self._wants_screen_text(query, frame)
                     
-                    if search_results:
-                        # Get content from first result
-                        content = self.web_searcher.get_page_content(search_results[0]['url'])
-                        if content:
-                            response = f"Found helpful information:\n\n{content[:800]}..."
-                        else:
-                            response = f"Found these resources:\n" + "\n".join([f"• {r['title']}" for r in search_results[:3]])
-                    else:
-                        response = "Sorry, I couldn't find specific information for your query. Try rephrasing your question."
-                
-                # Fallback to text-only LLM if available
-                if not response and self.llm_processor:
-                    response = self.llm_processor.process_text_query(query, self.current_game)
+                    # Screen analysis runs alongside web search and the text-only
+                    # LLM, which only answer if it fails
+                    strategies = self._query_strategies(query, frame, regions, history,
+                                                        read_text=read_text, key_frames=key_frames)
+                    plan = self.query_planner.run(
+                        strategies,
+                        deadline=config.QUERY_DEADLINE,
+                        primary=[name for name, _ in strategies if name in SCREEN_STRATEGIES]
+                    )
                 
-                if not response:
-                    response = "I'm unable to process your request right now. Please check your internet connection and API keys."
+                metrics.increment("queries_total", route="query", source=plan.source if plan else "none")
+                if not plan:
+                    return jsonify({'response': self._no_answer_message(), 'source': None})
                 
-                return jsonify({'response': response})
+                print(f"✅ Answered from {plan.source} in {plan.elapsed:.2f}s")
+                self.conversations.record(session_id, 'user', query)
+                self.conversations.record(session_id, 'assistant', plan.answer)
+                result = {'response': plan.answer, 'source': plan.source}
+                result.update(plan.extra)
+                return jsonify(result)
                 
             except Exception as e:
                 print(f"❌ Query processing error: {e}")
                 return jsonify({'error': str(e)}), 500
+            finally:
+                self.query_limiter.release()
+        
+        @self.app.route('/query/stream', methods=['POST'])
+        def handle_query_stream():
+            data = request.get_json(silent=True)
+            error = self._query_request_error(data)
+            if error:
+                return jsonify({'error': error}), 400
+            query = data['query'].strip()
+            regions = data.get('regions')
+            session_id = data.get('session_id') or 'default'
+            
+            if not self._await_subsystems('capture', 'llm', 'search'):
+                return jsonify({'error': 'Backend is still starting, try again shortly'}), 503
+            
+            if not self.query_limiter.acquire(timeout=config.QUERY_QUEUE_TIMEOUT):
+                return jsonify({'error': 'Server busy, try again shortly'}), 503
+            
+            # Same budget as /query: retries and backoff stop once it runs out
+            deadline = time.monotonic() + config.QUERY_DEADLINE
+            print(f"Streaming query: {query}")
+            frame = self._capture_for_query()
+            key_frames = self._key_frames(query, frame, data.get('temporal'))
+            history = self.conversations.history(session_id)
+            
+            def generate():
+                chunks = []
+                start = time.perf_counter()
+                source = "none"
+                # Web search and the text-only LLM start right away in case the streamed answer fails
+                fallback = self.query_planner.start(
+                    self._query_strategies(query, None, None, history, include_vision=False),
+                    deadline=max(0.0, deadline - time.monotonic())
+                )
+                try:
+                    with deadline_scope(deadline):
+                        screen_text = None
+                        if not key_frames and self._wants_screen_text(query, frame):
+                            screen_text = self._read_screen_text(frame, regions)
+                        if self.llm_processor and key_frames:
+                            print(f"🎞️ Analyzing {len(key_frames)} recent frames (streaming)...")
+                            source = 'temporal'
+                            for chunk in self.llm_processor.analyze_frames(
+                                    key_frames, query, stream=True, history=history):
+                                chunks.append(chunk)
+                                yield format_sse('token', {'text': chunk})
+                        elif self.llm_processor and screen_text:
+                            print("📝 Answering from on-screen text (streaming)...")
+                            source = 'ocr'
+                            for chunk in self.llm_processor.process_text_query(
+                                    query, self._screen_text_context(screen_text), stream=True, history=history):
+                                chunks.append(chunk)
+                                yield format_sse('token', {'text': chunk})
+                        # The image also backs up an on-screen text answer that didn't come through
+                        if self.llm_processor and frame and not key_frames and not chunks:
+                            print("🤖 Analyzing with AI (streaming)...")
+                            source = 'vision'
+                            screen_text = None
+                            for chunk in self.llm_processor.analyze_screenshot(
+                                    frame, query, regions, stream=True, history=history):
+                                chunks.append(chunk)
+                                yield format_sse('token', {'text': chunk})
+                        
+                        response = "".join(chunks)
+                        if not response:
+                            plan = fallback.result() if fallback else None
+                            response = plan.answer if plan else self._no_answer_message()
+                            source = plan.source if plan else 'none'
+                            yield format_sse('token', {'text': response})
+                        
+                        self.conversations.record(session_id, 'user', query)
+                        self.conversations.record(session_id, 'assistant', response)
+                        
+                        result = {'response': response}
+                        upload_stats = self.llm_processor.get_last_upload_stats() if self.llm_processor else None
+                        if screen_text:
+                            result['ocr'] = screen_text.stats()
+                        elif upload_stats:
+                            result['upload'] = upload_stats
+                        if key_frames:
+                            result['frames'] = len(key_frames)
+                        yield format_sse('done', result)
+                        
+                except StreamInterrupted as e:
+                    # The tokens already sent are not a full answer; keep them out of history
+                    print(f"⚠️  Streamed answer cut off: {e}")
+                    source = 'incomplete'
+                    yield format_sse('error', {
+                        'error': 'The answer was cut off, please try again',
+                        'partial': True,
+                        'response': "".join(chunks)
+                    })
+                except Exception as e:
+                    print(f"❌ Streaming query error: {e}")
+                    yield format_sse('error', {'error': str(e)})
+                finally:
+                    # No-op once the fallback answered; otherwise it is no longer needed
+                    if fallback:
+                        fallback.cancel()
+                    metrics.observe("stage_seconds", time.perf_counter() - start, stage="query_stream")
+                    metrics.increment("queries_total", route="stream", source=source)
+            
+            response = Response(
+                stream_with_context(generate()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+            # Hold the slot until the stream finishes or the client goes away
+            response.call_on_close(self.query_limiter.release)
+            return response
+        
+        @self.app.route('/events', methods=['GET'])
+        def event_stream():
+            subscriber = self.events.subscribe()
+            
+            def generate():
+                # Tell the client where things stand right away
+                yield format_sse('hello', {'current_game': self.current_game})
+                while True:
+                    try:
+                        yield subscriber.get(timeout=15)
+                    except queue.Empty:
+                        # Comment line keeps proxies from closing an idle stream
+                        yield ": keepalive\n\n"
+            
+            response = Response(
+                stream_with_context(generate()),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+            response.call_on_close(lambda: self.events.unsubscribe(subscriber))
+            return response
         
         @self.app.route('/screenshot', methods=['POST'])
         def handle_screenshot():
+            if not self._await_subsystems('capture', 'llm'):
+                return jsonify({'error': 'Backend is still starting, try again shortly'}), 503
+            if not self.screenshot_manager:
+                return jsonify({'error': 'Screen capture is unavailable'}), 503
             try:
-                screenshot_path = self.screenshot_manager.take_screenshot()
-                if screenshot_path:
+                frame = self.screenshot_manager.take_screenshot()
+                if frame:
                     print("📸 Screenshot captured successfully")
                     
                     # Auto-analyze if LLM is available
                     if self.llm_processor:
                         print("🤖 Auto-analyzing screenshot...")
-                        threading.Thread(
-                            target=self._auto_analyze_screenshot,
-                            args=(screenshot_path,),
-                            daemon=True
-                        ).start()
+                        queued = self.analysis_queue.submit(
+                            'auto_analysis',
+                            lambda job: self._auto_analyze_screenshot(frame, job)
+                        )
+                        if not queued:
+                            print("⚠️  Analysis queue full - skipping auto-analysis")
                     else:
-                        print("⚠️  LLM not available - set OPENAI_API_KEY to enable AI analysis")
+                        print("⚠️  LLM not available - set OPENAI_API_KEY or LLM_PROVIDER to enable AI analysis")
                     
                     return jsonify({'message': 'Screenshot captured successfully'})
                 else:
@@ -118,56 +452,310 @@ class BackendServer:
                 print(f"❌ Screenshot error: {e}")
                 return jsonify({'error': str(e)}), 500
         
+        @self.app.route('/config', methods=['GET'])
+        def get_config():
+            return jsonify({'settings': config.settings(), 'restart_required': sorted(RESTART_REQUIRED)})
+        
+        @self.app.route('/config', methods=['POST'])
+        def update_config():
+            changes = request.get_json(silent=True)
+            if not isinstance(changes, dict):
+                return jsonify({'error': 'Expected a JSON object of settings'}), 400
+            try:
+                changed = config.update(changes)
+            except ConfigError as e:
+                return jsonify({'error': 'Invalid settings', 'errors': e.errors}), 400
+            return jsonify({'changed': changed, 'settings': config.settings()})
+        
+        @self.app.route('/metrics', methods=['GET'])
+        def get_metrics():
+            return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+        
         @self.app.route('/status', methods=['GET'])
         def get_status():
+            capture = self.screenshot_manager
             return jsonify({
-                'screenshot_count': len(self.screenshot_manager.screenshots),
+                'startup': self.startup.snapshot(),
+                'screenshot_count': len(capture.frames) if capture else 0,
                 'llm_enabled': self.llm_processor is not None,
+                'llm_provider': self.llm_processor.provider.name if self.llm_processor else None,
                 'current_game': self.current_game,
-                'capturing': self.screenshot_manager.is_capturing
+                'capturing': capture.is_capturing if capture else False,
+                'probe_interval': capture.probe_interval if capture else None,
+                'capture': capture.capture_stats() if capture else None,
+                'scene_change': capture.last_change_score if capture else None,
+                'response_cache': self.llm_processor.cache.stats() if self.llm_processor else None,
+                'web_cache': self.web_searcher.cache.stats() if self.web_searcher else None,
+                'events': self.events.stats(),
+                'queries': self.query_limiter.stats(),
+                'analysis': self.analysis_queue.stats(),
+                'game_identifier': self.game_identifier.stats() if self.game_identifier else None,
+                'ocr': self.screen_text.stats() if self.screen_text else None,
+                'metrics': metrics.summary()
             })
     
-    def _auto_analyze_screenshot(self, screenshot_path: str):
-        """Automatically analyze a screenshot for game context."""
+    def _register_gauges(self):
+        """Expose queue depths and backend health on /metrics."""
+        metrics.gauge("frames_buffered", lambda: len(self.screenshot_manager.frames) if self.screenshot_manager else 0)
+        metrics.gauge("queries_active", lambda: self.query_limiter.stats()['active'])
+        metrics.gauge("queries_waiting", lambda: self.query_limiter.stats()['waiting'])
+        metrics.gauge("analysis_queue_depth", lambda: self.analysis_queue.stats()['queue_depth'])
+        metrics.gauge("analysis_workers_busy", lambda: self.analysis_queue.stats()['busy'])
+        metrics.gauge("event_subscribers", lambda: self.events.stats()['subscribers'])
+        
+        def breakers_open() -> Dict[str, int]:
+            breakers = {}
+            if self.web_searcher:
+                breakers['search'] = self.web_searcher.breaker
+            if self.llm_processor:
+                breakers['llm'] = self.llm_processor.breaker
+            return {name: int(b.state == 'open') for name, b in breakers.items()}
+        metrics.gauge("circuit_open", breakers_open, label="backend")
+    
+    def _query_strategies(self, query: str, frame: Optional["Frame"], regions: Optional[List[str]],
+                          history: Optional[List[Dict[str, str]]] = None,
+                          include_vision: bool = True,
+                          read_text: bool = False,
+                          key_frames: Optional[List["Frame"]] = None) -> List[Tuple[str, Any]]:
+        """Build the answer strategies for a query, most preferred first.
+        
+        With ``read_text`` the screen is OCR'd first and the query answered
+        from the recognized text; the image is only uploaded if that fails.
+        With ``key_frames`` the vision strategy sends those recent frames in
+        one request instead of one frame.
+        """
+        strategies = []
+        game = self.current_game
+        ocr_done = threading.Event()
+        ocr_answered = threading.Event()
+        
+        if include_vision and self.llm_processor and key_frames:
+            def temporal(cancel: threading.Event) -> Optional[StrategyResult]:
+                print(f"🎞️ Analyzing {len(key_frames)} recent frames...")
+                answer = self.llm_processor.analyze_frames(key_frames, query, history=history)
+                if not answer:
+                    return None
+                extra = {'frames': len(key_frames)}
+                upload_stats = self.llm_processor.get_last_upload_stats()
+                if upload_stats:
+                    extra['upload'] = upload_stats
+                return StrategyResult(answer, extra=extra)
+            strategies.append(('temporal', temporal))
+        elif self.llm_processor and frame:
+            if read_text:
+                def ocr(cancel: threading.Event) -> Optional[StrategyResult]:
+                    try:
+                        screen_text = self._read_screen_text(frame, regions)
+                        if not screen_text or cancel.is_set():
+                            return None
+                        print("📝 Answering from on-screen text...")
+                        answer = self.llm_processor.process_text_query(
+                            query, self._screen_text_context(screen_text), history=history
+                        )
+                        if not answer:
+                            return None
+                        ocr_answered.set()
+                        return StrategyResult(answer, extra={'ocr': screen_text.stats()})
+                    finally:
+                        ocr_done.set()
+                strategies.append(('ocr', ocr))
+            
+            if include_vision:
+                def vision(cancel: threading.Event) -> Optional[StrategyResult]:
+                    if read_text:
+                        # Only upload the image if the on-screen text gave no answer
+                        ocr_done.wait(remaining_budget())
+                        if cancel.is_set() or ocr_answered.is_set():
+                            return None
+                    print("🤖 Analyzing with AI...")
+                    answer = self.llm_processor.analyze_screenshot(frame, query, regions, history=history)
+                    if not answer:
+                        return None
+                    upload_stats = self.llm_processor.get_last_upload_stats()
+                    return StrategyResult(answer, extra={'upload': upload_stats} if upload_stats else {})
+                strategies.append(('vision', vision))
+        
+        def web(cancel: threading.Event) -> Optional[StrategyResult]:
+            # Guides fetched earlier in the session answer repeat questions without the network
+            passages = self.web_searcher.find_passages(query, game)
+            if passages:
+                return StrategyResult(f"Found helpful information:\n\n{self.web_searcher.format_passages(passages)}")
+            
+            print("🔍 Searching web...")
+            search_results = self.web_searcher.search_game_hints(query, game)
+            if not search_results or cancel.is_set():
+                return None
+            
+            # Fetch the top results in parallel and use the first with relevant passages
+            match = self.web_searcher.fetch_first_relevant(
+                search_results[:config.FETCH_TOP_N], query, game, should_stop=cancel.is_set
+            )
+            if match:
+                _, passages = match
+                return StrategyResult(f"Found helpful information:\n\n{self.web_searcher.format_passages(passages)}")
+            return StrategyResult(
+                f"Found these resources:\n" + "\n".join([f"• {r['title']}" for r in search_results[:3]]),
+                weak=True
+            )
+        if self.web_searcher:
+            strategies.append(('web', web))
+        
+        if self.llm_processor:
+            def text(cancel: threading.Event) -> Optional[StrategyResult]:
+                context = game
+                passages = self.web_searcher.find_passages(query, game) if self.web_searcher else []
+                if passages:
+                    excerpts = self.web_searcher.format_passages(passages)
+                    context = f"{game or 'unknown game'}\n\nRelevant guide excerpts:\n{excerpts}"
+                answer = self.llm_processor.process_text_query(query, context, history=history)
+                return StrategyResult(answer) if answer else None
+            strategies.append(('text', text))
+        
+        return strategies
+    
+    def _key_frames(self, query: str, frame: Optional["Frame"],
+                    temporal: Optional[bool] = None) -> Optional[List["Frame"]]:
+        """Recent frames for questions about what just happened; None for single-frame queries.
+        
+        ``temporal`` forces the mode on or off; by default the query wording decides.
+        """
+        from temporal import is_temporal_query
+        if temporal is None:
+            temporal = is_temporal_query(query)
+        if not (temporal and frame and self.llm_processor and config.TEMPORAL_FRAMES > 1):
+            return None
+        key_frames = self.screenshot_manager.get_key_frames()
+        return key_frames if len(key_frames) > 1 else None
+    
+    def _wants_screen_text(self, query: str, frame: Optional["Frame"]) -> bool:
+        """Whether a query asks to read on-screen text and OCR is available for it."""
+        from screen_text import is_text_query
+        return bool(config.OCR_ENABLED and self.screen_text and frame and is_text_query(query))
+    
+    def _read_screen_text(self, frame: "Frame", regions: Optional[List[str]]) -> Optional["ScreenText"]:
+        """OCR the frame; None if there is too little text to answer from."""
+        screen_text = self.screen_text.read(frame, regions or config.OCR_REGIONS, config.ROI_REGIONS)
+        if not screen_text or screen_text.chars < config.OCR_MIN_CHARS:
+            return None
+        print(f"📝 Read {screen_text.chars} characters of screen text in {screen_text.elapsed_ms:.0f} ms")
+        return screen_text
+    
+    def _screen_text_context(self, screen_text: "ScreenText") -> str:
+        return f"{self.current_game or 'unknown game'}\n\nText currently on screen:\n{screen_text.as_prompt()}"
+    
+    def _no_answer_message(self) -> str:
+        if not self.llm_processor:
+            return "Sorry, I couldn't find specific information for your query. Try rephrasing your question."
+        return "I'm unable to process your request right now. Please check your internet connection and API keys."
+    
+    def _auto_analyze_screenshot(self, frame: "Frame", job: AnalysisJob):
+        """Automatically analyze a screenshot for game context.
+
+        Runs on the analysis queue, which never runs two of these at once.
+        """
+        from frame_similarity import is_near_duplicate
         try:
-            query = "What game is this? What is the current objective or mission?"
-            print(f"🔍 Analyzing screenshot: {screenshot_path}")
-            response = self.llm_processor.analyze_screenshot(screenshot_path, query)
+            # Menus and pause screens produce many identical frames; only
+            # spend a vision call when the screen actually changed.
+            if (frame.phash is not None and self._last_analyzed_hash is not None
+                    and is_near_duplicate(frame.phash, self._last_analyzed_hash, config.FRAME_DEDUP_THRESHOLD)):
+                print(f"⏭️  Skipping analysis of frame {frame.frame_id}: screen unchanged")
+                self._send_known_analysis(frame)
+                return
+            
+            # Once the game is known it only needs re-checking after a drastic scene change
+            if (self.current_game and self.game_identifier
+                    and not self.game_identifier.needs_recheck(frame.image, config.GAME_RECHECK_CHANGE)):
+                print(f"⏭️  Skipping analysis of frame {frame.frame_id}: still {self.current_game}")
+                self._send_known_analysis(frame)
+                return
+            
+            identification = self.game_identifier.identify(frame.image) if self.game_identifier else None
+            if identification:
+                print(f"🎮 Identified {identification.game} locally in {identification.elapsed_ms} ms "
+                      f"({identification.matches} matching features)")
+                self._last_analyzed_hash = frame.phash
+                self._set_current_game(identification.game)
+                self._send_known_analysis(frame)
+                return
+            
+            query = ("What game is this? What is the current objective or mission? "
+                     "Start your answer with a line of the form 'Game: <title>'.")
+            print(f"🔍 Analyzing screenshot: frame {frame.frame_id}")
+            response = self.llm_processor.analyze_screenshot(frame, query, timeout=job.remaining())
+            
+            if job.expired():
+                print(f"⏱️  Analysis of frame {frame.frame_id} timed out")
+                return
             
             if response:
+                self._last_analyzed_hash = frame.phash
+                self.conversations.record_observation(response)
                 print(f"🤖 AI Analysis: {response[:100]}...")
                 
                 # Extract game name if possible
-                self.current_game = self._extract_game_name(response)
-                if self.current_game:
-                    print(f"🎮 Detected game: {self.current_game}")
-                    
-                    # Send auto-analysis result to frontend via a new endpoint
-                    self._send_auto_analysis_result(response, self.current_game)
+                game = self._extract_game_name(response)
+                if game and self.game_identifier:
+                    # The model's answer is the confirmation that teaches the local identifier
+                    self.game_identifier.add_signature(game, frame.image)
+                self._set_current_game(game)
+                self._last_analysis = (self.current_game, response)
+                
+                self._send_auto_analysis_result(response, self.current_game, frame)
             else:
                 print("❌ AI analysis returned no response")
                 
         except Exception as e:
             print(f"❌ Auto-analysis error: {e}")
     
-    def _send_auto_analysis_result(self, response: str, game_name: str):
-        """Send auto-analysis result to frontend (would need WebSocket or polling)"""
-        # For now, just log it - in a real app you'd use WebSocket or server-sent events
-        print(f"📤 Auto-analysis complete for {game_name}")
-        print(f"📝 Full response: {response}")
+    def _send_auto_analysis_result(self, response: str, game_name: Optional[str], frame: "Frame"):
+        """Push an auto-analysis result to connected overlays over /events."""
+        print(f"📤 Auto-analysis complete for {game_name or 'unknown game'}")
+        self.events.publish('analysis', {
+            'game': game_name,
+            'response': response,
+            'frame_id': frame.frame_id
+        })
+    
+    def _send_known_analysis(self, frame: "Frame"):
+        """Answer a capture that needs no vision call with the game and last known objective."""
+        game = self.current_game
+        if self._last_analysis and self._last_analysis[0] == game:
+            response = self._last_analysis[1]
+        elif game:
+            response = f"Playing {game}. Ask a question for details about this screen."
+        else:
+            response = "The screen hasn't changed since the last analysis."
+        self._send_auto_analysis_result(response, game, frame)
+    
+    def _set_current_game(self, game: Optional[str]):
+        previous_game = self.current_game
+        self.current_game = game
+        if game:
+            print(f"🎮 Detected game: {game}")
+            if game != previous_game:
+                self.events.publish('game_detected', {'game': game})
+    
+    def _publish_capture(self, frame: "Frame"):
+        self.events.publish('capture', {
+            'frame_id': frame.frame_id,
+            'captured_at': frame.timestamp,
+            'change_score': frame.change_score
+        })
     
     def _extract_game_name(self, response: str) -> Optional[str]:
         """Extract game name from LLM response."""
         import re
         
-        # Common game title patterns
+        # Common game title patterns, the requested "Game: <title>" line first
         patterns = [
+            r'^\W*Game\W*:\s*\**([^\n*]+?)\**\s*$',
             r'(?:This is|You\'re playing|The game is) ([A-Za-z\s]+?)(?:\.|,|\n|$)',
             r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*) (?:game|series)',
         ]
         
         for pattern in patterns:
-            match = re.search(pattern, response)
+            match = re.search(pattern, response, re.MULTILINE)
             if match:
                 game_name = match.group(1).strip()
                 if len(game_name) > 2 and len(game_name) < 50:
@@ -176,9 +764,16 @@ class BackendServer:
         return None
     
     def run(self):
-        """Run the Flask server."""
+        """Run the server, preferring waitress over Flask's development server."""
         print("🚀 Starting backend server on http://localhost:8080")
-        self.app.run(host='127.0.0.1', port=8080, debug=False, use_reloader=False)
+        try:
+            from waitress import serve
+        except ImportError:
+            # Threaded, so /health and /status stay responsive during slow queries
+            self.app.run(host='127.0.0.1', port=8080, debug=False, use_reloader=False, threaded=True)
+            return
+        
+        serve(self.app, host='127.0.0.1', port=8080, threads=config.SERVER_THREADS)
 
 def main():
     """Main entry point for backend server."""
@@ -194,7 +789,10 @@ def main():
         server.run()
     except KeyboardInterrupt:
         print("\n🛑 Shutting down server...")
-        server.screenshot_manager.stop_continuous_capture()
+        server.analysis_queue.shutdown()
+        server.query_planner.shutdown()
+        if server.screenshot_manager:
+            server.screenshot_manager.shutdown()
         sys.exit(0)
     except Exception as e:
         print(f"❌ Fatal error: {e}")
@@ -0,0 +1,68 @@
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def pooled_session(pool_size: int) -> requests.Session:
+    """A requests session that keeps up to ``pool_size`` connections per host alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class FairLimiter:
+    """A FIFO-fair concurrency limit.
+
+    Unlike ``threading.Semaphore``, waiters are admitted strictly in arrival
+    order, so a burst of overlapping queries is served first-come first-served
+    instead of whichever thread happens to wake up first.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiters: Deque[object] = deque()
+        self.rejected = 0
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a slot. Returns False if none freed up within ``timeout``."""
+        ticket = object()
+        with self._cond:
+            self._waiters.append(ticket)
+            admitted = self._cond.wait_for(
+                lambda: self._waiters[0] is ticket and self._active < self.limit,
+                timeout=timeout,
+            )
+            self._waiters.remove(ticket)
+            if admitted:
+                self._active += 1
+            else:
+                self.rejected += 1
+            # The next waiter in line may now be at the head of the queue
+            self._cond.notify_all()
+            return admitted
+
+    def release(self):
+        with self._cond:
+            self._active = max(0, self._active - 1)
+            self._cond.notify_all()
+
+    def set_limit(self, limit: int):
+        with self._cond:
+            self.limit = max(1, limit)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'active': self._active,
+                'waiting': len(self._waiters),
+                'rejected': self.rejected,
+            }
@@ -1,16 +1,147 @@
 import os
-from dataclasses import dataclass
-from typing import Optional
+import threading
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union, get_args, get_origin, get_type_hints
+
+# Never returned by /config
+SECRET_SETTINGS = {"OPENAI_API_KEY", "LLM_API_KEY"}
+
+# Read once when a subsystem starts; changing them needs a restart
+RESTART_REQUIRED = SECRET_SETTINGS | {
+    "LLM_PROVIDER", "LLM_BASE_URL", "CAPTURE_BACKEND", "CAPTURE_MONITOR", "CAPTURE_REPLAY_DIR",
+    "FRAME_BUFFER_MAX_BYTES", "MAX_SCREENSHOTS", "TESSERACT_CMD", "GAME_ID_FEATURES", "PASSAGE_CHARS",
+    "SERVER_THREADS", "ANALYSIS_WORKERS", "FETCH_WORKERS", "HTTP_POOL_SIZE", "LAZY_STARTUP",
+    "CACHE_DIR", "SCREENSHOT_DIR", "SEARCH_URL", "CORS_ORIGINS",
+}
+
+SETTING_CHOICES = {
+    "UPLOAD_FORMAT": {"jpeg", "webp", "png"},
+    "IMAGE_DETAIL": {"low", "high", "auto"},
+}
+
+# (min, max) for numeric settings; any other number just has to be non-negative
+SETTING_RANGES = {
+    "SCREENSHOT_QUALITY": (1, 100),
+    "OVERLAY_OPACITY": (0.3, 1.0),
+    "TEMPERATURE": (0.0, 2.0),
+    "SCENE_CHANGE_THRESHOLD": (0.0, 1.0),
+    "GAME_RECHECK_CHANGE": (0.0, 1.0),
+    "GAME_ID_MIN_SCORE": (0.0, 1.0),
+    "PASSAGE_MIN_COVERAGE": (0.0, 1.0),
+    "FRAME_DEDUP_THRESHOLD": (0, 64),
+    "CAPTURE_PROBE_INTERVAL": (0.05, None),
+    "CAPTURE_PROBE_MAX_INTERVAL": (0.05, None),
+    "CAPTURE_BACKOFF": (1.0, None),
+    "SCREENSHOT_INTERVAL": (1, None),
+    "MAX_TOKENS": (1, None),
+    "MAX_CONCURRENT_QUERIES": (1, None),
+    "RETRY_ATTEMPTS": (1, None),
+    "BREAKER_FAILURE_THRESHOLD": (1, None),
+    "TEMPORAL_FRAMES": (1, None),
+    "FETCH_PER_HOST": (1, None),
+    "ANALYSIS_MAX_PENDING": (1, None),
+    # Zero would fail every request or job rather than switch anything off
+    "QUERY_DEADLINE": (1.0, None),
+    "VISION_TIMEOUT": (1.0, None),
+    "TEXT_TIMEOUT": (1.0, None),
+    "SEARCH_TIMEOUT": (1, None),
+    "OCR_TIMEOUT": (0.5, None),
+    "ANALYSIS_JOB_TIMEOUT": (1.0, None),
+    "PAGE_CHUNK_BYTES": (1024, None),
+    "PAGE_MAX_BYTES": (1024, None),
+    "PAGE_MAX_CHARS": (1, None),
+    "MAX_SEARCH_RESULTS": (1, None),
+    "FETCH_TOP_N": (1, None),
+    "PASSAGE_TOP_K": (1, None),
+    "MAX_SESSIONS": (1, None),
+}
+
+
+class ConfigError(ValueError):
+    """Rejected setting changes, keyed by setting name."""
+
+    def __init__(self, errors: Dict[str, str]):
+        super().__init__("; ".join(f"{name}: {message}" for name, message in errors.items()))
+        self.errors = errors
+
+
+def _coerce(hint: Any, value: Any) -> Any:
+    """Convert a JSON value to the type of a setting, or raise ValueError."""
+    origin, args = get_origin(hint), get_args(hint)
+    if origin is Union:
+        if value is None and type(None) in args:
+            return None
+        return _coerce(next(arg for arg in args if arg is not type(None)), value)
+    if hint is bool:
+        if not isinstance(value, bool):
+            raise ValueError("expected true or false")
+        return value
+    if hint in (int, float):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError("expected a number")
+        if hint is int and value != int(value):
+            raise ValueError("expected a whole number")
+        return hint(value)
+    if hint is str:
+        if not isinstance(value, str):
+            raise ValueError("expected a string")
+        return value
+    if origin is tuple:
+        if not isinstance(value, (list, tuple)) or len(value) != len(args):
+            raise ValueError(f"expected a list of {len(args)} values")
+        return tuple(_coerce(arg, item) for arg, item in zip(args, value))
+    if origin is list:
+        if not isinstance(value, list):
+            raise ValueError("expected a list")
+        return [_coerce(args[0], item) for item in value]
+    if origin is dict:
+        if not isinstance(value, dict):
+            raise ValueError("expected an object")
+        return {_coerce(args[0], k): _coerce(args[1], v) for k, v in value.items()}
+    raise ValueError("can't be set at runtime")
+
+
+def _shape_error(name: str, value: Any) -> Optional[str]:
+    """Check settings whose parts must fit together, e.g. a rectangle on screen."""
+    if name == "CAPTURE_REGION" and value is not None:
+        left, top, width, height = value
+        if left < 0 or top < 0:
+            return "left and top must not be negative"
+        if width <= 0 or height <= 0:
+            return "width and height must be positive"
+    if name == "ROI_REGIONS":
+        for region, (x, y, width, height) in value.items():
+            if not all(0.0 <= part <= 1.0 for part in (x, y, width, height)):
+                return f"{region}: fractions must be between 0 and 1"
+            if width <= 0 or height <= 0:
+                return f"{region}: width and height must be positive"
+            if x + width > 1.0 + 1e-9 or y + height > 1.0 + 1e-9:
+                return f"{region}: must fit inside the frame"
+    return None
+
 
 @dataclass
 class Config:
     # API Keys
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
+    LLM_API_KEY: Optional[str] = os.getenv("LLM_API_KEY")  # key for a non-OpenAI provider, if it needs one
     
     # Screenshot settings
-    SCREENSHOT_INTERVAL: int = 300  # seconds (5 minutes)
-    SCREENSHOT_QUALITY: int = 85
+    SCREENSHOT_INTERVAL: int = 300  # seconds; a full frame is stored at least this often even if idle
+    CAPTURE_PROBE_INTERVAL: float = 0.5  # seconds between scene-change probes while the scene is active
+    CAPTURE_PROBE_MAX_INTERVAL: float = 5.0  # probe interval ceiling while the scene is idle
+    CAPTURE_BACKOFF: float = 1.5  # probe interval multiplier per idle probe
+    SCENE_CHANGE_THRESHOLD: float = 0.08  # scene-change score (0-1) that triggers a full capture
+    QUERY_CAPTURE_MAX_AGE: float = 2.0  # /query captures a fresh frame if the latest is older than this
+    SCREENSHOT_QUALITY: int = 85  # JPEG/WebP quality of images uploaded to the LLM
     MAX_SCREENSHOTS: int = 10
+    CAPTURE_BACKEND: str = "auto"  # auto, mss, pyautogui, screencapture (macOS) or replay
+    CAPTURE_REPLAY_DIR: Optional[str] = None  # images the replay backend cycles through
+    CAPTURE_MONITOR: int = 1  # MSS monitor index: 1 = primary, 0 = all monitors combined
+    CAPTURE_REGION: Optional[Tuple[int, int, int, int]] = None  # (left, top, width, height) to capture instead of a monitor
+    FRAME_BUFFER_MAX_BYTES: int = 256 * 1024 * 1024  # in-memory frame budget
+    SCREENSHOT_PERSIST: bool = False  # also write captured frames to SCREENSHOT_DIR
+    FRAME_DEDUP_THRESHOLD: int = 4  # max differing dHash bits for frames to count as duplicates
     
     # Overlay settings
     OVERLAY_WIDTH: int = 400
@@ -18,13 +149,97 @@ class Config:
     OVERLAY_OPACITY: float = 0.9
     
     # LLM settings
-    MODEL_NAME: str = "gpt-4o-mini"
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "openai")  # openai, ollama, llamacpp, local or mock
+    LLM_BASE_URL: Optional[str] = os.getenv("LLM_BASE_URL")  # overrides the provider's default endpoint
+    MODEL_NAME: str = os.getenv("LLM_VISION_MODEL", "gpt-4o-mini")  # vision model
+    TEXT_MODEL_NAME: str = os.getenv("LLM_TEXT_MODEL", "gpt-4.1-mini")  # text-only queries and summaries
+    VISION_TIMEOUT: float = 60.0  # seconds per screenshot analysis request
+    TEXT_TIMEOUT: float = 30.0  # seconds per text query or summary request
     MAX_TOKENS: int = 5000
     TEMPERATURE: float = 0.1
+    UPLOAD_MAX_EDGE: int = 1280  # long edge in pixels of images sent to the LLM; 0 = full size
+    UPLOAD_FORMAT: str = "jpeg"  # jpeg, webp or png
+    IMAGE_DETAIL: str = "auto"  # image_url detail: low, high or auto
+    # Named regions of interest as (x, y, width, height) fractions of the frame.
+    # "auto" can also be requested to detect dialog-like panels.
+    ROI_REGIONS: Dict[str, Tuple[float, float, float, float]] = field(default_factory=lambda: {
+        "minimap": (0.75, 0.0, 0.25, 0.3),
+        "hud_top_left": (0.0, 0.0, 0.3, 0.2),
+        "hud_bottom_left": (0.0, 0.8, 0.3, 0.2),
+        "hud_bottom_right": (0.7, 0.8, 0.3, 0.2),
+        "dialog": (0.1, 0.65, 0.8, 0.35),
+    })
+    RESPONSE_CACHE_SIZE: int = 256  # in-memory entries; older ones stay in the SQLite tier
+    RESPONSE_CACHE_TTL: int = 1800  # seconds
+    
+    # OCR (used only when the tesseract binary is installed)
+    OCR_ENABLED: bool = True
+    TESSERACT_CMD: str = "tesseract"
+    OCR_LANGUAGE: str = "eng"
+    OCR_REGIONS: List[str] = field(default_factory=lambda: ["dialog", "hud_top_left", "hud_bottom_left", "hud_bottom_right"])
+    OCR_MIN_CHARS: int = 20  # recognized characters needed to answer from screen text instead of the image
+    OCR_TIMEOUT: float = 5.0  # seconds per region
+    OCR_CACHE_SIZE: int = 128  # cached (frame, region) texts
+    
+    # Temporal analysis ("what just happened?") sends several recent frames in one request
+    TEMPORAL_FRAMES: int = 4  # frames per request, including the current one
+    TEMPORAL_WINDOW: float = 30.0  # seconds of capture history to choose from
+    TEMPORAL_MAX_EDGE: int = 768  # long edge of each frame; smaller than UPLOAD_MAX_EDGE to keep the batch cheap
+    
+    # Game identification
+    GAME_ID_FEATURES: int = 500  # ORB features extracted per frame
+    GAME_SIGNATURES_PER_GAME: int = 20  # newest confirmed frames kept per game
+    GAME_ID_MIN_MATCHES: int = 30  # matching features needed to trust a local identification
+    GAME_ID_MIN_SCORE: float = 0.1  # share of a frame's features that must match
+    GAME_ID_MARGIN: float = 1.5  # best game must beat the runner-up by this factor
+    GAME_RECHECK_CHANGE: float = 0.15  # scene-change score (0-1) that triggers re-identification
+    
+    # Session memory
+    SESSION_TOKEN_BUDGET: int = 1500  # history tokens per session before older turns are summarized
+    SESSION_RECENT_TURNS: int = 6  # turns always kept verbatim
+    SESSION_SUMMARY_MAX_TOKENS: int = 300
+    MAX_SESSIONS: int = 20
     
     # Web search settings
+    SEARCH_URL: str = "https://duckduckgo.com/html/"  # DuckDuckGo HTML endpoint
     SEARCH_TIMEOUT: int = 10
     MAX_SEARCH_RESULTS: int = 5
+    SEARCH_CACHE_TTL: int = 3600  # seconds search results are reused without asking DuckDuckGo
+    PAGE_CACHE_TTL: int = 6 * 3600  # seconds before a cached guide page is revalidated
+    PAGE_MAX_CHARS: int = 100_000  # extracted text kept per guide page
+    FETCH_TOP_N: int = 3  # search results fetched in parallel per lookup
+    FETCH_WORKERS: int = 8  # guide page fetch threads
+    FETCH_PER_HOST: int = 2  # concurrent fetches allowed against one host
+    PAGE_MAX_BYTES: int = 2 * 1024 * 1024  # stop downloading a guide page after this many bytes
+    PAGE_CHUNK_BYTES: int = 16 * 1024  # read size while streaming a page
+    PASSAGE_CHARS: int = 600  # target passage length in the guide index
+    PASSAGE_TOP_K: int = 3  # passages returned per guide lookup
+    PASSAGE_MIN_COVERAGE: float = 0.5  # share of a question's significant terms a passage must contain
+    WEB_CACHE_MAX_BYTES: int = 50 * 1024 * 1024  # on-disk budget for cached searches and pages
+    GUIDE_INDEX_MAX_BYTES: int = 20 * 1024 * 1024  # passage text kept in the guide index
+    
+    # Server settings
+    SERVER_THREADS: int = 16  # worker threads when served by waitress
+    # Browser origins allowed to call the backend. The overlay calls from Electron's
+    # main process, which sends no Origin header, so none are needed by default.
+    CORS_ORIGINS: List[str] = field(default_factory=list)
+    MAX_CONCURRENT_QUERIES: int = 4  # queries processed at once; the rest queue in arrival order
+    QUERY_QUEUE_TIMEOUT: float = 30.0  # seconds a query may wait for a slot before 503
+    QUERY_DEADLINE: float = 20.0  # seconds before /query answers with the best result so far
+    QUERY_PREFERENCE_GRACE: float = 1.5  # seconds to wait for a preferred answer after a fallback one arrives (counted once screen analysis has failed)
+    ANALYSIS_WORKERS: int = 1  # background analysis workers; jobs of one purpose (only auto_analysis today) run one at a time
+    ANALYSIS_JOB_TIMEOUT: float = 45.0  # seconds an auto-analysis job may take, including time queued
+    ANALYSIS_MAX_PENDING: int = 8  # queued auto-analysis jobs (one per purpose) before new ones are refused
+    HTTP_POOL_SIZE: int = 10  # keep-alive connections per host for LLM and search calls
+    LAZY_STARTUP: bool = True  # serve /health first and start capture, LLM, search etc. in the background
+    STARTUP_WAIT_TIMEOUT: float = 15.0  # seconds a request waits for the subsystems it needs to start
+    
+    # Resilience
+    RETRY_ATTEMPTS: int = 3  # tries per LLM/search call on timeouts, 429s and 5xx
+    RETRY_BASE_DELAY: float = 0.5  # seconds; backoff doubles per retry, with full jitter
+    RETRY_MAX_DELAY: float = 8.0  # longest backoff or Retry-After honored before giving up
+    BREAKER_FAILURE_THRESHOLD: int = 3  # consecutive failed calls that open a backend's circuit
+    BREAKER_RESET_TIMEOUT: float = 30.0  # seconds before an open circuit lets a trial call through
     
     # Hotkeys
     TOGGLE_OVERLAY_HOTKEY: str = "ctrl+shift+g"
@@ -33,5 +248,87 @@ class Config:
     # Storage
     CACHE_DIR: str = "cache"
     SCREENSHOT_DIR: str = "screenshots"
+    
+    def __post_init__(self):
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+    
+    def settings(self) -> Dict[str, Any]:
+        """Current value of every setting, without secrets."""
+        with self._lock:
+            return {f.name: getattr(self, f.name) for f in fields(self) if f.name not in SECRET_SETTINGS}
+    
+    def update(self, changes: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate and apply setting changes, then notify subscribers.
+        
+        Either every change is applied or, if any is invalid, none is and
+        ``ConfigError`` is raised. Returns the settings whose value changed.
+        """
+        # Validating, applying and notifying under one lock keeps updates
+        # (and what subscribers see) in order
+        with self._lock:
+            hints = get_type_hints(Config)
+            names = {f.name for f in fields(self)}
+            errors: Dict[str, str] = {}
+            values: Dict[str, Any] = {}
+            for name, value in changes.items():
+                if name not in names:
+                    errors[name] = "unknown setting"
+                    continue
+                if name in RESTART_REQUIRED:
+                    errors[name] = "only takes effect after a restart"
+                    continue
+                try:
+                    value = _coerce(hints[name], value)
+                except ValueError as e:
+                    errors[name] = str(e)
+                    continue
+                if name in SETTING_CHOICES and value not in SETTING_CHOICES[name]:
+                    errors[name] = f"must be one of {', '.join(sorted(SETTING_CHOICES[name]))}"
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    low, high = SETTING_RANGES.get(name, (0, None))
+                    if (low is not None and value < low) or (high is not None and value > high):
+                        errors[name] = f"must be between {low} and {high}" if high is not None else f"must be at least {low}"
+                else:
+                    shape_error = _shape_error(name, value)
+                    if shape_error:
+                        errors[name] = shape_error
+                values[name] = value
+            
+            def merged(name: str) -> Any:
+                return values.get(name, getattr(self, name))
+            # No other update can land between this check and applying the changes
+            if not errors and merged("CAPTURE_PROBE_MAX_INTERVAL") < merged("CAPTURE_PROBE_INTERVAL"):
+                errors["CAPTURE_PROBE_MAX_INTERVAL"] = "must be at least CAPTURE_PROBE_INTERVAL"
+            unknown = [name for name in merged("OCR_REGIONS") if name != "auto" and name not in merged("ROI_REGIONS")]
+            if not errors and unknown:
+                if "OCR_REGIONS" in values:
+                    errors["OCR_REGIONS"] = f"unknown regions: {', '.join(unknown)}"
+                else:
+                    errors["ROI_REGIONS"] = f"still used by OCR_REGIONS: {', '.join(unknown)}"
+            if errors:
+                raise ConfigError(errors)
+            
+            changed = {name: value for name, value in values.items() if getattr(self, name) != value}
+            for name, value in changed.items():
+                setattr(self, name, value)
+            if changed:
+                print(f"⚙️  Settings changed: {', '.join(sorted(changed))}")
+                for listener in list(self._listeners):
+                    try:
+                        listener(changed)
+                    except Exception as e:
+                        print(f"Settings listener failed: {e}")
+        return changed
+    
+    def subscribe(self, listener: Callable[[Dict[str, Any]], None]):
+        """Call ``listener(changed)`` after each successful update."""
+        with self._lock:
+            self._listeners.append(listener)
+    
+    def unsubscribe(self, listener: Callable[[Dict[str, Any]], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
 
 config = Config()
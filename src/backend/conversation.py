@@ -0,0 +1,147 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+# summarizer(previous_summary, turns) -> new summary, or None on failure
+Summarizer = Callable[[str, List["Turn"]], Optional[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English)."""
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class Turn:
+    role: str  # "user", "assistant" or "observation"
+    content: str
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.content)
+
+    def as_text(self) -> str:
+        label = {"user": "Player", "assistant": "Assistant", "observation": "Screen"}.get(self.role, self.role)
+        return f"{label}: {self.content}"
+
+
+def extractive_summary(previous: str, turns: List[Turn], max_tokens: int) -> str:
+    """Summary fallback that keeps the first sentence of each folded turn."""
+    notes = []
+    for turn in turns:
+        first = re.split(r"(?<=[.!?])\s+", turn.content.strip(), maxsplit=1)[0]
+        label = turn.as_text().split(":", 1)[0]
+        notes.append(f"{label}: {first[:160]}")
+    summary = " ".join(part for part in [previous, " ".join(notes)] if part)
+    # Drop the oldest notes first if the summary outgrew its budget
+    max_chars = max_tokens * 4
+    if len(summary) > max_chars:
+        summary = summary[-max_chars:].split(" ", 1)[-1]
+    return summary
+
+
+class Conversation:
+    """One session: a running summary plus the most recent turns verbatim."""
+
+    def __init__(self):
+        self.summary = ""
+        self.turns: List[Turn] = []
+        self.lock = threading.Lock()
+        self.compacting = False
+
+    def token_count(self) -> int:
+        return estimate_tokens(self.summary) + sum(turn.tokens for turn in self.turns)
+
+    def context_messages(self) -> List[Dict[str, str]]:
+        """Chat messages to place between the system prompt and the new query."""
+        with self.lock:
+            messages = []
+            if self.summary:
+                messages.append({"role": "system", "content": f"Summary of the session so far: {self.summary}"})
+            for turn in self.turns:
+                if turn.role == "observation":
+                    messages.append({"role": "system", "content": f"Earlier screen analysis: {turn.content}"})
+                else:
+                    messages.append({"role": turn.role, "content": turn.content})
+            return messages
+
+
+class ConversationStore:
+    """Per-session conversation memory with a token budget.
+
+    When a session exceeds ``token_budget``, every turn except the last
+    ``recent_turns`` is folded into the running summary on a background
+    thread, so prompt size stays flat however long the session runs.
+    """
+
+    def __init__(self, token_budget: int, recent_turns: int, summary_max_tokens: int,
+                 max_sessions: int, summarizer: Optional[Summarizer] = None):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summary_max_tokens = summary_max_tokens
+        self.max_sessions = max_sessions
+        self.summarizer = summarizer
+        self._sessions: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Conversation:
+        with self._lock:
+            conversation = self._sessions.get(session_id)
+            if conversation is None:
+                conversation = Conversation()
+                self._sessions[session_id] = conversation
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session_id)
+            return conversation
+
+    def history(self, session_id: str) -> List[Dict[str, str]]:
+        return self.get(session_id).context_messages()
+
+    def record(self, session_id: str, role: str, content: str):
+        """Append a turn and fold old turns into the summary if over budget."""
+        conversation = self.get(session_id)
+        with conversation.lock:
+            conversation.turns.append(Turn(role, content))
+            if conversation.compacting or conversation.token_count() <= self.token_budget:
+                return
+            conversation.compacting = True
+        threading.Thread(target=self._compact, args=(conversation,), daemon=True).start()
+
+    def record_observation(self, content: str):
+        """Add an auto-analysis result to every active session."""
+        with self._lock:
+            session_ids = list(self._sessions) or ["default"]
+        for session_id in session_ids:
+            self.record(session_id, "observation", content)
+
+    def _compact(self, conversation: Conversation):
+        try:
+            with conversation.lock:
+                keep = min(self.recent_turns, len(conversation.turns) - 1)
+                folded = conversation.turns[:len(conversation.turns) - keep]
+                previous = conversation.summary
+
+            if not folded:
+                return
+
+            summary = None
+            if self.summarizer:
+                try:
+                    summary = self.summarizer(previous, folded)
+                except Exception as e:
+                    print(f"Conversation summarizer failed: {e}")
+            if not summary:
+                summary = extractive_summary(previous, folded, self.summary_max_tokens)
+
+            with conversation.lock:
+                # New turns may have been appended meanwhile; only drop the folded ones
+                conversation.turns = [t for t in conversation.turns if not any(t is f for f in folded)]
+                conversation.summary = summary
+        finally:
+            with conversation.lock:
+                conversation.compacting = False
@@ -0,0 +1,57 @@
+import json
+import queue
+import threading
+import time
+from typing import Any, Dict, List
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class EventBroadcaster:
+    """Fans backend events out to every connected event-stream client.
+
+    Each subscriber gets its own bounded queue; a slow client loses its
+    oldest events rather than blocking the publisher.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: List["queue.Queue[str]"] = []
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self) -> "queue.Queue[str]":
+        subscriber: "queue.Queue[str]" = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: "queue.Queue[str]"):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        message = format_sse(event, dict(data, timestamp=time.time()))
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                try:
+                    subscriber.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'subscribers': len(self._subscribers), 'published': self.published}
@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+
+from temporal import select_key_frames
+
+
+@dataclass
+class Frame:
+    """A captured screen frame held in memory."""
+    frame_id: int
+    timestamp: float
+    image: np.ndarray  # HxWx3 uint8, RGB
+    path: Optional[str] = None
+    phash: Optional[int] = None
+    change_score: Optional[float] = None  # scene change relative to the previous capture
+    digest: Optional[str] = None  # exact pixel hash, computed once when the frame is stored
+
+    @property
+    def nbytes(self) -> int:
+        return self.image.nbytes
+
+
+@dataclass
+class _Entry:
+    frame_id: int
+    timestamp: float
+    slot: int
+    path: Optional[str] = None
+    phash: Optional[int] = None
+    change_score: Optional[float] = None
+    digest: Optional[str] = None
+
+
+class FrameRingBuffer:
+    """Bounded ring buffer of frames stored in preallocated NumPy slots.
+
+    Slots are allocated once for the current frame shape, sized so the whole
+    buffer stays within ``max_bytes``. A change of resolution (e.g. the game
+    switching display modes) reallocates the slots and drops older frames.
+    """
+
+    def __init__(self, max_bytes: int, max_frames: int):
+        self.max_bytes = max_bytes
+        self.max_frames = max_frames
+        self._lock = threading.Lock()
+        self._slots: Optional[np.ndarray] = None
+        self._shape: Optional[Tuple[int, ...]] = None
+        # Oldest first
+        self._entries: Deque[_Entry] = deque()
+        self._next_slot = 0
+        self._next_id = 1
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._slots is None else self._slots.shape[0]
+
+    def _allocate(self, shape: Tuple[int, ...]):
+        frame_bytes = int(np.prod(shape))
+        capacity = max(1, min(self.max_frames, self.max_bytes // max(frame_bytes, 1)))
+        self._slots = np.empty((capacity,) + tuple(shape), dtype=np.uint8)
+        self._shape = tuple(shape)
+        self._entries.clear()
+        self._next_slot = 0
+
+    def append(self, image: np.ndarray, timestamp: Optional[float] = None,
+               phash: Optional[int] = None, change_score: Optional[float] = None,
+               digest: Optional[str] = None) -> Frame:
+        """Copy an image into the next slot and return it as a Frame."""
+        if image.dtype != np.uint8:
+            image = image.astype(np.uint8)
+        with self._lock:
+            if self._shape != image.shape:
+                self._allocate(image.shape)
+
+            if len(self._entries) >= self.capacity:
+                self._entries.popleft()
+
+            slot = self._next_slot
+            self._next_slot = (self._next_slot + 1) % self.capacity
+            np.copyto(self._slots[slot], image)
+
+            entry = _Entry(
+                frame_id=self._next_id,
+                timestamp=timestamp if timestamp is not None else time.time(),
+                slot=slot,
+                phash=phash,
+                change_score=change_score,
+                digest=digest,
+            )
+            self._next_id += 1
+            self._entries.append(entry)
+            return self._to_frame(entry)
+
+    def _to_frame(self, entry: _Entry) -> Frame:
+        return Frame(
+            frame_id=entry.frame_id,
+            timestamp=entry.timestamp,
+            image=self._slots[entry.slot].copy(),
+            path=entry.path,
+            phash=entry.phash,
+            change_score=entry.change_score,
+            digest=entry.digest,
+        )
+
+    def _find(self, frame_id: int) -> Optional[_Entry]:
+        for entry in self._entries:
+            if entry.frame_id == frame_id:
+                return entry
+        return None
+
+    def latest(self) -> Optional[Frame]:
+        """Return a copy of the most recent frame."""
+        with self._lock:
+            if not self._entries:
+                return None
+            return self._to_frame(self._entries[-1])
+
+    def get(self, frame_id: int) -> Optional[Frame]:
+        """Return a copy of the frame with the given id, if still buffered."""
+        with self._lock:
+            entry = self._find(frame_id)
+            return self._to_frame(entry) if entry else None
+
+    def frames(self) -> List[Frame]:
+        """Return copies of all buffered frames, oldest first."""
+        with self._lock:
+            return [self._to_frame(entry) for entry in self._entries]
+
+    def key_frames(self, count: int, window: float, dedup_threshold: int) -> List[Frame]:
+        """Return copies of the most informative recent frames, oldest first.
+
+        Selection runs on metadata, so only the chosen frames are copied.
+        """
+        with self._lock:
+            chosen = select_key_frames(list(self._entries), count, window, dedup_threshold)
+            return [self._to_frame(entry) for entry in chosen]
+
+    def set_path(self, frame_id: int, path: str):
+        """Record where a frame was persisted on disk."""
+        with self._lock:
+            entry = self._find(frame_id)
+            if entry:
+                entry.path = path
+
+    def latest_hash(self) -> Optional[int]:
+        """Perceptual hash of the most recent frame, without copying pixels."""
+        with self._lock:
+            return self._entries[-1].phash if self._entries else None
+
+    def replace_latest(self, image: np.ndarray, timestamp: Optional[float] = None,
+                       phash: Optional[int] = None, change_score: Optional[float] = None,
+                       digest: Optional[str] = None) -> Optional[Frame]:
+        """Overwrite the latest frame with a newer capture of the same scene.
+
+        The frame keeps its slot, so near-duplicates do not push older frames
+        out of the buffer, but gets a new id and timestamp since its pixels
+        changed. Returns None when the buffer is empty or the shape differs.
+        """
+        if image.dtype != np.uint8:
+            image = image.astype(np.uint8)
+        with self._lock:
+            if not self._entries or self._shape != image.shape:
+                return None
+            entry = self._entries[-1]
+            np.copyto(self._slots[entry.slot], image)
+            entry.frame_id = self._next_id
+            self._next_id += 1
+            entry.timestamp = timestamp if timestamp is not None else time.time()
+            entry.path = None
+            entry.digest = digest
+            if phash is not None:
+                entry.phash = phash
+            if change_score is not None:
+                entry.change_score = change_score
+            return self._to_frame(entry)
+
+    def drop_older_than(self, max_age: float) -> int:
+        """Forget frames older than ``max_age`` seconds. Returns the number dropped."""
+        cutoff = time.time() - max_age
+        dropped = 0
+        with self._lock:
+            while self._entries and self._entries[0].timestamp < cutoff:
+                self._entries.popleft()
+                dropped += 1
+        return dropped
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,71 @@
+import hashlib
+
+import cv2
+import numpy as np
+
+
+def dhash(image: np.ndarray, hash_size: int = 8) -> int:
+    """Compute a difference hash of an RGB frame.
+
+    The frame is shrunk to (hash_size + 1) x hash_size grayscale pixels and
+    each bit records whether a pixel is brighter than its right neighbour, so
+    the result is stable under compression noise and small UI changes.
+    """
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def content_hash(image: np.ndarray) -> str:
+    """Exact hash of an image's pixels.
+
+    Unlike ``dhash`` this tells apart frames that differ only in small
+    details such as dialog text, so it is the one to key cached answers on.
+    """
+    image = np.ascontiguousarray(image)
+    digest = hashlib.blake2b(image.data, digest_size=16)
+    digest.update(str(image.shape).encode("ascii"))
+    return digest.hexdigest()
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+def is_near_duplicate(a: int, b: int, threshold: int) -> bool:
+    """Whether two frame hashes are within ``threshold`` bits of each other."""
+    return hamming_distance(a, b) <= threshold
+
+
+# (width, height) of scene-change thumbnails
+PROBE_SIZE = (64, 36)
+
+
+def scene_probe(image: np.ndarray, size: tuple = PROBE_SIZE) -> np.ndarray:
+    """Shrink a frame to a tiny grayscale thumbnail for scene-change checks."""
+    small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+    return small
+
+
+def scene_change(previous: np.ndarray, current: np.ndarray) -> float:
+    """Score in [0, 1] of how much the scene changed between two probes.
+
+    Takes the larger of the mean pixel delta and the histogram distance, so
+    both in-place changes (a dialog opening) and global ones (a cut to a new
+    area with the same layout) register.
+    """
+    pixel_delta = float(np.mean(cv2.absdiff(previous, current))) / 255.0
+    hist_prev = cv2.calcHist([previous], [0], None, [32], [0, 256])
+    hist_cur = cv2.calcHist([current], [0], None, [32], [0, 256])
+    cv2.normalize(hist_prev, hist_prev)
+    cv2.normalize(hist_cur, hist_cur)
+    hist_delta = float(cv2.compareHist(hist_prev, hist_cur, cv2.HISTCMP_BHATTACHARYYA))
+    return max(pixel_delta, hist_delta)
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from frame_similarity import scene_change, scene_probe
+from metrics import metrics
+
+# Frames are shrunk to this width before feature extraction
+DESCRIBE_WIDTH = 640
+
+
+@dataclass
+class Identification:
+    game: str
+    score: float  # share of the frame's features matching the game's best signature
+    matches: int
+    elapsed_ms: float
+
+
+class GameIdentifier:
+    """Identifies the running game on the CPU from ORB feature signatures.
+
+    Signatures are the ORB descriptors of frames whose game was confirmed by
+    the vision model. They are kept in SQLite so identification works from
+    the first frame of the next session. A frame is attributed to a game when
+    enough of its features match one of that game's signatures and the game
+    clearly beats the runner-up.
+    """
+
+    def __init__(self, db_path: str, features: int, signatures_per_game: int,
+                 min_matches: int, min_score: float, margin: float):
+        self.signatures_per_game = signatures_per_game
+        self.min_matches = min_matches
+        self.min_score = min_score
+        self.margin = margin
+        self._orb = cv2.ORB_create(nfeatures=features)
+        self._matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+        self._lock = threading.Lock()
+        self._signatures: Dict[str, List[np.ndarray]] = defaultdict(list)
+        self._last_probe: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+        self.total_ms = 0.0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS signatures ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, game TEXT NOT NULL, "
+            "descriptors BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        self._db.commit()
+        for game, blob in self._db.execute("SELECT game, descriptors FROM signatures ORDER BY id"):
+            self._signatures[game].append(np.frombuffer(blob, dtype=np.uint8).reshape(-1, 32))
+
+    def describe(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """ORB descriptors of a frame, or None if it has too little texture."""
+        height, width = image.shape[:2]
+        if width > DESCRIBE_WIDTH:
+            image = cv2.resize(image, (DESCRIBE_WIDTH, int(height * DESCRIBE_WIDTH / width)),
+                               interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+        _, descriptors = self._orb.detectAndCompute(gray, None)
+        if descriptors is None or len(descriptors) < self.min_matches:
+            return None
+        return descriptors
+
+    def _good_matches(self, query: np.ndarray, signature: np.ndarray) -> int:
+        pairs = self._matcher.knnMatch(query, signature, k=2)
+        # Lowe's ratio test drops ambiguous matches
+        return sum(1 for pair in pairs if len(pair) == 2 and pair[0].distance < 0.75 * pair[1].distance)
+
+    def identify(self, image: np.ndarray) -> Optional[Identification]:
+        """Best matching known game, or None if no game matches confidently."""
+        start = time.perf_counter()
+        descriptors = self.describe(image)
+        with self._lock:
+            best: Dict[str, int] = {}
+            if descriptors is not None:
+                for game, signatures in self._signatures.items():
+                    best[game] = max(self._good_matches(descriptors, s) for s in signatures)
+            elapsed = time.perf_counter() - start
+            metrics.observe("stage_seconds", elapsed, stage="game_id")
+            elapsed_ms = elapsed * 1000
+            self.total_ms += elapsed_ms
+
+            ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)
+            if ranked:
+                game, matches = ranked[0]
+                runner_up = ranked[1][1] if len(ranked) > 1 else 0
+                score = matches / len(descriptors)
+                if (matches >= self.min_matches and score >= self.min_score
+                        and matches >= self.margin * runner_up):
+                    self.hits += 1
+                    self._last_probe = scene_probe(image)
+                    return Identification(game, round(score, 3), matches, round(elapsed_ms, 2))
+            self.misses += 1
+            return None
+
+    def add_signature(self, game: str, image: np.ndarray):
+        """Remember a frame whose game was confirmed elsewhere."""
+        descriptors = self.describe(image)
+        with self._lock:
+            self._last_probe = scene_probe(image)
+            if descriptors is None:
+                return
+            signatures = self._signatures[game]
+            signatures.append(descriptors)
+            try:
+                self._db.execute(
+                    "INSERT INTO signatures (game, descriptors, created) VALUES (?, ?, ?)",
+                    (game, descriptors.tobytes(), time.time()),
+                )
+                # Keep only the newest signatures per game
+                while len(signatures) > self.signatures_per_game:
+                    signatures.pop(0)
+                    self._db.execute(
+                        "DELETE FROM signatures WHERE id = "
+                        "(SELECT id FROM signatures WHERE game = ? ORDER BY id LIMIT 1)",
+                        (game,),
+                    )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Game signature write error: {e}")
+
+    def needs_recheck(self, image: np.ndarray, threshold: float) -> bool:
+        """Whether the scene changed enough since the last identification to re-identify."""
+        with self._lock:
+            if self._last_probe is None:
+                return True
+            return scene_change(self._last_probe, scene_probe(image)) >= threshold
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'games': len(self._signatures),
+                'signatures': sum(len(s) for s in self._signatures.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'avg_ms': round(self.total_ms / lookups, 2) if lookups else None,
+            }
@@ -0,0 +1,227 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "be", "can", "do", "does", "for", "from", "get",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "the", "this", "to",
+    "what", "where", "which", "who", "why", "with", "you", "your",
+}
+
+
+@dataclass
+class Passage:
+    text: str
+    url: str
+    title: str
+    score: float
+    coverage: float = 1.0  # share of the query's significant terms found in the passage
+
+
+def chunk_passages(text: str, max_chars: int) -> List[str]:
+    """Split page text into passages of roughly ``max_chars`` on sentence boundaries."""
+    sentences = re.split(r"(?<=[.!?])\s+", text)
+    passages: List[str] = []
+    current = ""
+    for sentence in sentences:
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        # Hard-wrap run-on "sentences" such as navigation link lists
+        while len(sentence) > max_chars:
+            passages.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            passages.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        passages.append(current)
+    return passages
+
+
+def query_terms(query: str) -> List[str]:
+    """Significant terms of a question, in order, without duplicates."""
+    terms = [t for t in re.findall(r"\w+", query.lower()) if t not in STOPWORDS and len(t) > 1]
+    return list(dict.fromkeys(terms))
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """Turn free text into an FTS5 OR-query over its significant terms."""
+    terms = query_terms(query)
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def _stem(word: str) -> str:
+    """Crude suffix stripping, close enough to FTS5's porter stemmer for coverage checks."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def term_coverage(terms: List[str], text: str) -> float:
+    """Share of ``terms`` that occur in ``text``."""
+    if not terms:
+        return 0.0
+    words = {_stem(word) for word in re.findall(r"\w+", text.lower())}
+    return sum(1 for term in terms if _stem(term) in words) / len(terms)
+
+
+class GuideIndex:
+    """Per-game BM25 passage index over fetched guide pages (SQLite FTS5).
+
+    Pages indexed before the game was known are stored untagged and match
+    any game until a later lookup tags them. Once the indexed text exceeds
+    ``max_bytes`` the least recently used pages are evicted.
+    """
+
+    def __init__(self, db_path: str, passage_chars: int, max_bytes: int):
+        self.passage_chars = passage_chars
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5("
+            "body, game UNINDEXED, url UNINDEXED, title UNINDEXED, tokenize = 'porter unicode61')"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, game TEXT NOT NULL, title TEXT, indexed REAL NOT NULL, "
+            "accessed REAL NOT NULL DEFAULT 0, size INTEGER NOT NULL DEFAULT 0)"
+        )
+        # Indexes created before eviction existed lack the bookkeeping columns
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(pages)")}
+        if "accessed" not in columns:
+            self._db.execute("ALTER TABLE pages ADD COLUMN accessed REAL NOT NULL DEFAULT 0")
+        if "size" not in columns:
+            self._db.execute("ALTER TABLE pages ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+        self._db.commit()
+
+    @staticmethod
+    def _game_key(game: Optional[str]) -> str:
+        return (game or "").strip().lower()
+
+    def has_page(self, url: str, max_age: Optional[float] = None) -> bool:
+        """Whether a page is indexed, and if ``max_age`` is given, indexed that recently."""
+        with self._lock:
+            row = self._db.execute("SELECT indexed FROM pages WHERE url = ?", (url,)).fetchone()
+            return row is not None and (max_age is None or time.time() - row[0] <= max_age)
+
+    def tag_page(self, url: str, game: Optional[str]):
+        """Assign an untagged page to a game now that the game is known."""
+        game_key = self._game_key(game)
+        if not game_key:
+            return
+        with self._lock:
+            try:
+                cursor = self._db.execute(
+                    "UPDATE pages SET game = ? WHERE url = ? AND game = ''", (game_key, url)
+                )
+                if cursor.rowcount:
+                    self._db.execute("UPDATE passages SET game = ? WHERE url = ?", (game_key, url))
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Guide index write error: {e}")
+
+    def add_page(self, url: str, title: str, text: str, game: Optional[str] = None) -> int:
+        """(Re)index a page's passages. Returns the number of passages stored.
+
+        Refreshing a page without a game keeps the game it was tagged with.
+        """
+        game_key = self._game_key(game)
+        passages = chunk_passages(text, self.passage_chars)
+        size = sum(len(passage.encode("utf-8")) for passage in passages)
+        with self._lock:
+            try:
+                if not game_key:
+                    row = self._db.execute("SELECT game FROM pages WHERE url = ?", (url,)).fetchone()
+                    game_key = row[0] if row else ""
+                self._db.execute("DELETE FROM passages WHERE url = ?", (url,))
+                self._db.executemany(
+                    "INSERT INTO passages (body, game, url, title) VALUES (?, ?, ?, ?)",
+                    [(passage, game_key, url, title) for passage in passages],
+                )
+                now = time.time()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO pages (url, game, title, indexed, accessed, size) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, game_key, title, now, now, size),
+                )
+                self._evict(keep=url)
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Guide index write error: {e}")
+                return 0
+        return len(passages)
+
+    def search(self, query: str, game: Optional[str] = None, k: int = 3,
+               url: Optional[str] = None, min_coverage: float = 0.0) -> List[Passage]:
+        """Top-k passages for a query, best first, limited to a game or a page.
+
+        Without a game only untagged pages are searched: guides stored for
+        some other game must not answer while the game is unknown.
+
+        The FTS query ORs the terms together, so a passage sharing a single
+        common word would match; ``min_coverage`` drops passages containing
+        less than that share of the query's significant terms.
+        """
+        terms = query_terms(query)
+        match = build_match_query(query)
+        if not match:
+            return []
+
+        sql = "SELECT body, url, title, bm25(passages) AS score FROM passages WHERE passages MATCH ?"
+        params: list = [match]
+        if url:
+            sql += " AND url = ?"
+            params.append(url)
+        elif game:
+            # Untagged pages were fetched before the game was detected
+            sql += " AND (game = ? OR game = '')"
+            params.append(self._game_key(game))
+        else:
+            sql += " AND game = ''"
+        sql += " ORDER BY score LIMIT ?"
+        # Extra candidates make up for the ones the coverage floor drops
+        params.append(k * 5 if min_coverage > 0 else k)
+
+        with self._lock:
+            try:
+                rows = self._db.execute(sql, params).fetchall()
+                rows = [(*row, term_coverage(terms, row[0])) for row in rows]
+                rows = [row for row in rows if row[4] >= min_coverage][:k]
+                if rows:
+                    urls = list({row[1] for row in rows})
+                    self._db.execute(
+                        f"UPDATE pages SET accessed = ? WHERE url IN ({', '.join('?' * len(urls))})",
+                        [time.time(), *urls],
+                    )
+                    self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Guide index query error: {e}")
+                return []
+        # FTS5's bm25() is negative with lower being better; flip it for callers
+        return [Passage(text=row[0], url=row[1], title=row[2], score=-row[3], coverage=row[4]) for row in rows]
+
+    def _evict(self, keep: str):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        while total > self.max_bytes:
+            row = self._db.execute(
+                "SELECT url, size FROM pages WHERE url != ? ORDER BY accessed ASC LIMIT 1", (keep,)
+            ).fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM passages WHERE url = ?", (row[0],))
+            self._db.execute("DELETE FROM pages WHERE url = ?", (row[0],))
+            total -= row[1]
+            self.evictions += 1
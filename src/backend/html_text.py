@@ -0,0 +1,56 @@
+import re
+from html.parser import HTMLParser
+from typing import List
+
+# Elements whose content is never useful guide text
+SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "iframe",
+    "nav", "header", "footer", "aside", "form", "button", "select",
+}
+
+# Elements that separate runs of text
+BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "table", "tr", "td", "th", "section",
+    "article", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "dd", "dt",
+}
+
+
+class HTMLTextExtractor(HTMLParser):
+    """Incremental HTML-to-text converter.
+
+    Feed it decoded chunks as they arrive; content inside SKIP_TAGS is
+    dropped on the fly, and ``char_count`` lets the caller stop reading once
+    it has enough text.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._parts: List[str] = []
+        self._skip_depth = 0
+        self.char_count = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._parts.append(" ")
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags never open a skipped region
+        if tag in BLOCK_TAGS:
+            self._parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self._parts.append(" ")
+
+    def handle_data(self, data):
+        if self._skip_depth or not data.strip():
+            return
+        self._parts.append(data)
+        self.char_count += len(data)
+
+    def get_text(self) -> str:
+        return re.sub(r"\s+", " ", "".join(self._parts)).strip()
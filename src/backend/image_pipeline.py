@@ -0,0 +1,121 @@
+import base64
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# (x, y, width, height) as fractions of the frame size
+Region = Tuple[float, float, float, float]
+
+_ENCODINGS = {
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY),
+    "png": (".png", "image/png", None),
+}
+
+
+@dataclass
+class EncodedImage:
+    """An image ready to be sent to the vision model."""
+    data_url: str
+    mime_type: str
+    width: int
+    height: int
+    payload_bytes: int
+    encode_ms: float
+    region: Optional[str] = None
+
+
+def crop_region(image: np.ndarray, region: Region) -> np.ndarray:
+    """Crop a fractional region out of an image."""
+    height, width = image.shape[:2]
+    x, y, w, h = region
+    left = int(max(0.0, min(1.0, x)) * width)
+    top = int(max(0.0, min(1.0, y)) * height)
+    right = max(left + 1, int(max(0.0, min(1.0, x + w)) * width))
+    bottom = max(top + 1, int(max(0.0, min(1.0, y + h)) * height))
+    return image[top:bottom, left:right]
+
+
+def resolve_regions(image: np.ndarray, names: List[str], known: Dict[str, Region]) -> List[Tuple[str, Region]]:
+    """Look up named regions; ``"auto"`` expands to detected dialog-like panels."""
+    crops = []
+    for name in names:
+        if name == "auto":
+            for i, rect in enumerate(detect_panel_regions(image)):
+                crops.append((f"auto_{i}", rect))
+        elif name in known:
+            crops.append((name, known[name]))
+        else:
+            print(f"Unknown region '{name}', ignoring")
+    return crops
+
+
+def downscale(image: np.ndarray, max_edge: int) -> np.ndarray:
+    """Shrink an image so its long edge is at most ``max_edge`` pixels."""
+    height, width = image.shape[:2]
+    long_edge = max(height, width)
+    if max_edge <= 0 or long_edge <= max_edge:
+        return image
+    scale = max_edge / long_edge
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def encode_image(image: np.ndarray, max_edge: int, image_format: str, quality: int,
+                 region_name: Optional[str] = None) -> EncodedImage:
+    """Downscale and compress an RGB image into a base64 data URL."""
+    start = time.perf_counter()
+    extension, mime_type, quality_flag = _ENCODINGS.get(image_format.lower(), _ENCODINGS["jpeg"])
+
+    resized = downscale(image, max_edge)
+    bgr = cv2.cvtColor(resized, cv2.COLOR_RGB2BGR)
+    params = [quality_flag, int(quality)] if quality_flag is not None else []
+    ok, encoded = cv2.imencode(extension, bgr, params)
+    if not ok:
+        raise ValueError(f"Failed to encode image as {image_format}")
+
+    data = encoded.tobytes()
+    data_url = f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+    return EncodedImage(
+        data_url=data_url,
+        mime_type=mime_type,
+        width=resized.shape[1],
+        height=resized.shape[0],
+        payload_bytes=len(data),
+        encode_ms=(time.perf_counter() - start) * 1000,
+        region=region_name,
+    )
+
+
+def detect_panel_regions(image: np.ndarray, max_regions: int = 3) -> List[Region]:
+    """Find large rectangular UI panels such as dialog boxes.
+
+    Works on a downscaled copy: edges are closed into blobs and the bounding
+    boxes of wide, mostly-rectangular contours are returned, largest first.
+    """
+    small = downscale(image, 640)
+    height, width = small.shape[:2]
+    frame_area = float(width * height)
+
+    gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+    edges = cv2.Canny(gray, 50, 150)
+    edges = cv2.dilate(edges, np.ones((3, 3), np.uint8), iterations=2)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    candidates = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        area = w * h
+        if not 0.02 * frame_area <= area <= 0.6 * frame_area:
+            continue
+        if w < 1.5 * h:
+            continue
+        if cv2.contourArea(contour) < 0.7 * area:
+            continue
+        candidates.append((area, (x / width, y / height, w / width, h / height)))
+
+    candidates.sort(key=lambda item: item[0], reverse=True)
+    return [region for _, region in candidates[:max_regions]]
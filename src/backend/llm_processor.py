@@ -1,136 +1,403 @@
 import os
-import base64
-import requests
-from typing import Optional, Dict, Any
-from PIL import Image
-import io
+import json
+import threading
+import time
+from typing import Optional, Dict, Any, Iterator, List, Tuple, Union
 
+from concurrency import pooled_session
 from config import config
+from conversation import Turn
+from frame_buffer import Frame
+from frame_similarity import content_hash
+from image_pipeline import EncodedImage, crop_region, encode_image, resolve_regions
+from llm_provider import LLMProvider, create_provider
+from metrics import metrics
+from resilience import CircuitBreaker, RetryPolicy, StreamInterrupted, resilient_request
+from response_cache import ResponseCache, make_cache_key, normalize_query
 
-class LLMProcessor:
-    def __init__(self):
-        self.api_key = config.OPENAI_API_KEY
-        if not self.api_key:
-            raise ValueError("OPENAI_API_KEY environment variable not set")
-    
-    def encode_image(self, image_path: str) -> str:
-        """Encode image to base64 string."""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
-    
-    def analyze_screenshot(self, image_path: str, query: str) -> Optional[str]:
-        """Analyze screenshot with multimodal LLM."""
-        try:
-            # Get the base64 image
-            base64_image = self.encode_image(image_path)
-            
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            payload = {
-                "model": config.MODEL_NAME,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": """You are a gaming assistant AI. Analyze the provided game screenshot and answer the user's question. 
+VISION_SYSTEM_PROMPT = """You are a gaming assistant AI. Analyze the provided game screenshot and answer the user's question.
                         Focus on:
                         - Game state and progress indicators
                         - UI elements, maps, minimaps
                         - Character status, inventory, objectives
                         - Mission details, timers, progress bars
-                        
+
                         Provide helpful, concise answers about game mechanics, objectives, or strategies based on what you can see."""
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": query
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                "max_tokens": config.MAX_TOKENS,
-                "temperature": config.TEMPERATURE
-            }
-            
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
-            else:
-                print(f"LLM API Error: {response.status_code} - {response.text}")
-                return None
-                
-        except Exception as e:
-            print(f"Error analyzing screenshot: {e}")
-            return None
-    
-    def process_text_query(self, query: str, game_context: Optional[str] = None) -> Optional[str]:
-        """Process text-only query with optional game context."""
-        try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            system_message = """You are a knowledgeable gaming assistant. Provide helpful hints, tips, and strategies for video games.
+
+TEXT_SYSTEM_PROMPT = """You are a knowledgeable gaming assistant. Provide helpful hints, tips, and strategies for video games.
             Focus on:
             - Game mechanics and strategies
             - Mission walkthroughs
             - Item locations and unlock requirements
             - Character builds and optimization
-            
+
             Be concise but thorough in your responses."""
-            
+
+
+def _frame_digest(frame: Frame) -> str:
+    """Exact pixel hash of a frame; frames from the capture buffer already carry one."""
+    return frame.digest or content_hash(frame.image)
+
+
+class LLMProcessor:
+    def __init__(self, provider: Optional[LLMProvider] = None):
+        if provider is None:
+            name = config.LLM_PROVIDER.lower()
+            api_key = config.OPENAI_API_KEY if name == "openai" else config.LLM_API_KEY
+            provider = create_provider(name, config.LLM_BASE_URL, api_key)
+        self.provider = provider
+        self._local = threading.local()
+        # Reuse keep-alive connections to the API instead of a new TLS handshake per call
+        self.session = pooled_session(config.HTTP_POOL_SIZE)
+        # Skip the API right away while it's down instead of waiting out timeouts
+        self.breaker = CircuitBreaker("llm", config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_TIMEOUT)
+        self.retry_policy = RetryPolicy(config.RETRY_ATTEMPTS, config.RETRY_BASE_DELAY, config.RETRY_MAX_DELAY)
+        self.cache = ResponseCache(
+            os.path.join(config.CACHE_DIR, "responses.sqlite3"),
+            max_entries=config.RESPONSE_CACHE_SIZE,
+            ttl=config.RESPONSE_CACHE_TTL,
+        )
+
+    def apply_config(self, changed: Dict[str, Any]):
+        """Pick up settings changed at runtime.
+
+        Models, token limits, sampling and upload encoding are read per
+        request already; this updates what was copied at construction.
+        """
+        if changed.keys() & {"RESPONSE_CACHE_SIZE", "RESPONSE_CACHE_TTL"}:
+            self.cache.max_entries = config.RESPONSE_CACHE_SIZE
+            self.cache.ttl = config.RESPONSE_CACHE_TTL
+        if changed.keys() & {"RETRY_ATTEMPTS", "RETRY_BASE_DELAY", "RETRY_MAX_DELAY"}:
+            self.retry_policy = RetryPolicy(config.RETRY_ATTEMPTS, config.RETRY_BASE_DELAY, config.RETRY_MAX_DELAY)
+        if changed.keys() & {"BREAKER_FAILURE_THRESHOLD", "BREAKER_RESET_TIMEOUT"}:
+            self.breaker.configure(config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_TIMEOUT)
+
+    def prepare_images(self, frame: Frame, regions: Optional[List[str]] = None) -> List[EncodedImage]:
+        """Downscale, crop and compress a frame for upload.
+
+        ``regions`` names entries of ``config.ROI_REGIONS``; ``"auto"`` adds
+        detected dialog-like panels. Without regions the whole frame is sent.
+        """
+        crops = resolve_regions(frame.image, regions or [], config.ROI_REGIONS)
+
+        if not crops:
+            return [encode_image(frame.image, config.UPLOAD_MAX_EDGE, config.UPLOAD_FORMAT, config.SCREENSHOT_QUALITY)]
+
+        return [
+            encode_image(crop_region(frame.image, rect), config.UPLOAD_MAX_EDGE,
+                         config.UPLOAD_FORMAT, config.SCREENSHOT_QUALITY, region_name=name)
+            for name, rect in crops
+        ]
+
+    def get_last_upload_stats(self) -> Optional[Dict[str, Any]]:
+        """Payload size and encode time of this thread's last vision request."""
+        return getattr(self._local, "upload_stats", None)
+
+    def analyze_screenshot(self, frame: Frame, query: str, regions: Optional[List[str]] = None,
+                           stream: bool = False, history: Optional[List[Dict[str, str]]] = None,
+                           timeout: Optional[float] = None) -> Union[Optional[str], Iterator[str]]:
+        """Analyze screenshot with multimodal LLM.
+
+        With ``stream=True`` a generator of text chunks is returned instead of
+        the full answer; it raises ``StreamInterrupted`` if it fails midway.
+        ``history`` holds earlier session messages; it is left out of the
+        cache key, which changes with every turn.
+        """
+        self._local.upload_stats = None
+        # Keyed on the exact pixels: frames that differ only in dialog text share a perceptual hash
+        cache_key = make_cache_key(
+            "vision", _frame_digest(frame), normalize_query(query), sorted(regions or []),
+            self.provider.base_url, config.MODEL_NAME, config.TEMPERATURE,
+            config.UPLOAD_MAX_EDGE, config.UPLOAD_FORMAT, config.IMAGE_DETAIL
+        )
+
+        def build_payload() -> Dict[str, Any]:
+            with metrics.span("encode"):
+                images = self.prepare_images(frame, regions)
+            self._record_upload(images)
+
+            content: List[Dict[str, Any]] = [{"type": "text", "text": query}]
+            for image in images:
+                if image.region:
+                    content.append({"type": "text", "text": f"Region: {image.region}"})
+                content.append({
+                    "type": "image_url",
+                    "image_url": {"url": image.data_url, "detail": config.IMAGE_DETAIL}
+                })
+
+            return {
+                "model": config.MODEL_NAME,
+                "messages": [
+                    {"role": "system", "content": VISION_SYSTEM_PROMPT},
+                    *(history or []),
+                    {"role": "user", "content": content}
+                ],
+                "max_tokens": config.MAX_TOKENS,
+                "temperature": config.TEMPERATURE
+            }
+
+        if timeout is None:
+            timeout = config.VISION_TIMEOUT
+        if stream:
+            return self._stream(build_payload, cache_key, "analyzing screenshot", "llm_vision", timeout)
+        return self._complete(build_payload, cache_key, "analyzing screenshot", "llm_vision", timeout)
+
+    def analyze_frames(self, frames: List[Frame], query: str, stream: bool = False,
+                       history: Optional[List[Dict[str, str]]] = None,
+                       timeout: Optional[float] = None) -> Union[Optional[str], Iterator[str]]:
+        """Analyze several recent frames, oldest first, in one multimodal request.
+
+        Each frame goes in as its own image part labelled with how long before
+        the newest frame it was captured, so the model can reason about what
+        just happened.
+        """
+        self._local.upload_stats = None
+        cache_key = make_cache_key(
+            "temporal", [_frame_digest(frame) for frame in frames], normalize_query(query),
+            self.provider.base_url, config.MODEL_NAME, config.TEMPERATURE,
+            config.TEMPORAL_MAX_EDGE, config.UPLOAD_FORMAT, config.IMAGE_DETAIL
+        )
+
+        def build_payload() -> Dict[str, Any]:
+            with metrics.span("encode"):
+                images = [encode_image(frame.image, config.TEMPORAL_MAX_EDGE, config.UPLOAD_FORMAT,
+                                       config.SCREENSHOT_QUALITY) for frame in frames]
+            self._record_upload(images)
+
+            newest = frames[-1].timestamp
+            content: List[Dict[str, Any]] = [{
+                "type": "text",
+                "text": f"{query}\n\nThese are {len(frames)} screenshots from the last few seconds of play, "
+                        f"oldest first. The last one is the current screen."
+            }]
+            for i, (frame, image) in enumerate(zip(frames, images), 1):
+                offset = newest - frame.timestamp
+                label = "now" if offset < 0.05 else f"{offset:.1f}s earlier"
+                content.append({"type": "text", "text": f"Frame {i} ({label})"})
+                content.append({
+                    "type": "image_url",
+                    "image_url": {"url": image.data_url, "detail": config.IMAGE_DETAIL}
+                })
+
+            return {
+                "model": config.MODEL_NAME,
+                "messages": [
+                    {"role": "system", "content": VISION_SYSTEM_PROMPT},
+                    *(history or []),
+                    {"role": "user", "content": content}
+                ],
+                "max_tokens": config.MAX_TOKENS,
+                "temperature": config.TEMPERATURE
+            }
+
+        if timeout is None:
+            timeout = config.VISION_TIMEOUT
+        if stream:
+            return self._stream(build_payload, cache_key, "analyzing recent frames", "llm_temporal", timeout)
+        return self._complete(build_payload, cache_key, "analyzing recent frames", "llm_temporal", timeout)
+
+    def _record_upload(self, images: List[EncodedImage]):
+        self._local.upload_stats = {
+            'images': len(images),
+            'payload_bytes': sum(image.payload_bytes for image in images),
+            'encode_ms': round(sum(image.encode_ms for image in images), 2),
+            'sizes': [f"{image.width}x{image.height}" for image in images],
+            'format': config.UPLOAD_FORMAT,
+            'detail': config.IMAGE_DETAIL,
+        }
+        metrics.observe("upload_bytes", self._local.upload_stats['payload_bytes'])
+        print(f"Uploading {len(images)} image(s): {self._local.upload_stats['payload_bytes']} bytes, "
+              f"encoded in {self._local.upload_stats['encode_ms']} ms")
+
+    def process_text_query(self, query: str, game_context: Optional[str] = None,
+                           stream: bool = False, history: Optional[List[Dict[str, str]]] = None
+                           ) -> Union[Optional[str], Iterator[str]]:
+        """Process text-only query with optional game context.
+
+        Unlike a vision answer, which the screen pins down, a text answer to
+        a follow-up depends on the conversation, so ``history`` is part of
+        the cache key.
+        """
+        cache_key = make_cache_key(
+            "text", game_context, normalize_query(query), self.provider.base_url, config.TEXT_MODEL_NAME,
+            config.TEMPERATURE, history or []
+        )
+
+        def build_payload() -> Dict[str, Any]:
+            system_message = TEXT_SYSTEM_PROMPT
             if game_context:
                 system_message += f"\n\nCurrent game context: {game_context}"
-            
-            payload = {
-                "model": "gpt-4.1-mini",
+
+            return {
+                "model": config.TEXT_MODEL_NAME,
                 "messages": [
-                    {
-                        "role": "system",
-                        "content": system_message
-                    },
-                    {
-                        "role": "user",
-                        "content": query
-                    }
+                    {"role": "system", "content": system_message},
+                    *(history or []),
+                    {"role": "user", "content": query}
                 ],
                 "max_tokens": config.MAX_TOKENS,
                 "temperature": config.TEMPERATURE
             }
-            
-            response = requests.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=60
-            )
-            
+
+        if stream:
+            return self._stream(build_payload, cache_key, "processing text query", "llm_text", config.TEXT_TIMEOUT)
+        return self._complete(build_payload, cache_key, "processing text query", "llm_text", config.TEXT_TIMEOUT)
+
+    def summarize_conversation(self, previous_summary: str, turns: List[Turn]) -> Optional[str]:
+        """Fold conversation turns into a short running summary."""
+        transcript = "\n".join(turn.as_text() for turn in turns)
+        prompt = (
+            f"Previous summary:\n{previous_summary or '(none)'}\n\n"
+            f"New conversation turns:\n{transcript}\n\n"
+            "Write an updated summary of the gaming session in a few sentences: the game, "
+            "where the player is, their goals and what they have already asked about."
+        )
+        payload = {
+            "model": config.TEXT_MODEL_NAME,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": config.SESSION_SUMMARY_MAX_TOKENS,
+            "temperature": 0
+        }
+        return self._complete(lambda: payload, None, "summarizing conversation", "llm_summary", config.TEXT_TIMEOUT)
+
+    def _complete(self, build_payload, cache_key: Optional[str], action: str, stage: str,
+                  timeout: float) -> Optional[str]:
+        """Send a chat completion request and return the whole answer.
+
+        ``stage`` names the request in metrics (llm_vision, llm_text, ...).
+        """
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                metrics.increment("llm_requests_total", stage=stage, outcome="cached")
+                return cached
+
+        try:
+            payload = build_payload()
+            with metrics.span(stage):
+                response = resilient_request(
+                    lambda call_timeout: self.session.post(
+                        self.provider.chat_url,
+                        headers=self.provider.headers(),
+                        json=payload,
+                        timeout=call_timeout
+                    ),
+                    self.retry_policy, timeout, self.breaker
+                )
+
             if response.status_code == 200:
                 result = response.json()
-                return result["choices"][0]["message"]["content"]
+                self._record_usage(stage, result.get("usage"))
+                metrics.increment("llm_requests_total", stage=stage, outcome="ok")
+                content = result["choices"][0]["message"]["content"]
+                if cache_key and content:
+                    self.cache.put(cache_key, content)
+                return content
             else:
+                metrics.increment("llm_requests_total", stage=stage, outcome="error")
                 print(f"LLM API Error: {response.status_code} - {response.text}")
                 return None
-                
+
         except Exception as e:
-            print(f"Error processing text query: {e}")
+            metrics.increment("llm_requests_total", stage=stage, outcome="error")
+            print(f"Error {action}: {e}")
             return None
+
+    def _stream(self, build_payload, cache_key: Optional[str], action: str, stage: str,
+                timeout: float) -> Iterator[str]:
+        """Send a streaming chat completion request and yield text chunks.
+
+        A request that fails before any text yields nothing, so the caller can
+        fall back; one that fails after some text raises ``StreamInterrupted``.
+        """
+        if cache_key:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                metrics.increment("llm_requests_total", stage=stage, outcome="cached")
+                yield cached
+                return
+
+        chunks: List[str] = []
+        completed = False
+        error = "stream ended before the answer was complete"
+        start = time.perf_counter()
+        try:
+            payload = build_payload()
+            payload["stream"] = True
+            if self.provider.name == "openai":
+                # Ask for token usage in the final chunk
+                payload["stream_options"] = {"include_usage": True}
+            response = resilient_request(
+                lambda call_timeout: self.session.post(
+                    self.provider.chat_url,
+                    headers=self.provider.headers(),
+                    json=payload,
+                    timeout=call_timeout,
+                    stream=True
+                ),
+                self.retry_policy, timeout, self.breaker
+            )
+            with response:
+                if response.status_code != 200:
+                    print(f"LLM API Error: {response.status_code} - {response.text}")
+                    return
+
+                for line in response.iter_lines(decode_unicode=True):
+                    data = self._parse_sse_line(line)
+                    if data is None:
+                        continue
+                    if data == "[DONE]":
+                        completed = True
+                        break
+                    text, finished, usage = self._parse_stream_chunk(data)
+                    self._record_usage(stage, usage)
+                    if text:
+                        if not chunks:
+                            metrics.observe("stage_seconds", time.perf_counter() - start,
+                                            stage=f"{stage}_first_token")
+                        chunks.append(text)
+                        yield text
+                    if finished:
+                        completed = True
+
+        except Exception as e:
+            print(f"Error {action}: {e}")
+            error = str(e)
+        finally:
+            metrics.observe("stage_seconds", time.perf_counter() - start, stage=stage)
+            metrics.increment("llm_requests_total", stage=stage, outcome="ok" if completed else "error")
+            # Only complete answers are cached; an aborted stream is partial.
+            if cache_key and completed and chunks:
+                self.cache.put(cache_key, "".join(chunks))
+
+        if chunks and not completed:
+            raise StreamInterrupted(error)
+
+    @staticmethod
+    def _record_usage(stage: str, usage: Optional[Dict[str, Any]]):
+        if not usage:
+            return
+        for kind in ("prompt", "completion"):
+            tokens = usage.get(f"{kind}_tokens")
+            if tokens:
+                metrics.increment("llm_tokens_total", tokens, stage=stage, kind=kind)
+
+    @staticmethod
+    def _parse_sse_line(line: Optional[str]) -> Optional[str]:
+        if not line or not line.startswith("data:"):
+            return None
+        return line[len("data:"):].strip()
+
+    @staticmethod
+    def _parse_stream_chunk(data: str) -> Tuple[Optional[str], bool, Optional[Dict[str, Any]]]:
+        """Return the text delta, whether the choice finished, and any token usage."""
+        try:
+            event = json.loads(data)
+        except ValueError:
+            return None, False, None
+        usage = event.get("usage")
+        choices = event.get("choices") or []
+        if not choices:
+            return None, False, usage
+        choice = choices[0]
+        return (choice.get("delta") or {}).get("content"), choice.get("finish_reason") is not None, usage
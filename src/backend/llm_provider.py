@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+# Default OpenAI-compatible endpoints per provider
+DEFAULT_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "ollama": "http://127.0.0.1:11434/v1",
+    "llamacpp": "http://127.0.0.1:8081/v1",
+    "local": "http://127.0.0.1:11434/v1",
+    "mock": None,  # an in-process mock server is started on demand
+}
+
+# Providers that are reached over the internet and need a key
+KEYED_PROVIDERS = {"openai"}
+
+
+@dataclass
+class LLMProvider:
+    """An OpenAI-compatible chat completions endpoint."""
+    name: str
+    base_url: str
+    api_key: Optional[str] = None
+
+    @property
+    def chat_url(self) -> str:
+        return f"{self.base_url.rstrip('/')}/chat/completions"
+
+    def headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+
+def create_provider(name: str, base_url: Optional[str] = None,
+                    api_key: Optional[str] = None) -> LLMProvider:
+    """Build the configured provider.
+
+    ``openai`` needs an API key. ``ollama``, ``llamacpp`` and ``local`` talk
+    to an OpenAI-compatible server on this machine. ``mock`` answers
+    deterministically and starts its own server unless ``base_url`` is given.
+    """
+    name = name.lower()
+    if name not in DEFAULT_BASE_URLS:
+        raise ValueError(f"Unknown LLM provider '{name}' (expected one of: {', '.join(DEFAULT_BASE_URLS)})")
+    if name in KEYED_PROVIDERS and not api_key:
+        raise ValueError("OPENAI_API_KEY environment variable not set")
+
+    base_url = base_url or DEFAULT_BASE_URLS[name]
+    if base_url is None:
+        from mock_llm_server import start_mock_server
+        server = start_mock_server(port=0)
+        base_url = f"http://127.0.0.1:{server.server_port}/v1"
+        print(f"Started mock LLM server at {base_url}")
+    return LLMProvider(name=name, base_url=base_url, api_key=api_key)
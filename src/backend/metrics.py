@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+# Labels are stored as a sorted tuple of (name, value) pairs
+Labels = Tuple[Tuple[str, str], ...]
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+METRIC_HELP = {
+    "stage_seconds": "Time spent in each pipeline stage",
+    "upload_bytes": "Encoded image bytes sent per vision request",
+    "llm_tokens_total": "Tokens reported by the LLM API",
+    "llm_requests_total": "LLM requests by stage and outcome",
+    "queries_total": "Answered queries by route and answer source",
+}
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class RollingHistogram:
+    """Quantiles over the samples of the last ``window`` seconds.
+
+    Also keeps an all-time count and sum, as Prometheus summaries expect.
+    """
+
+    def __init__(self, window: float, max_samples: int):
+        self.window = window
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self._samples.append((time.monotonic(), value))
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self) -> Dict[float, Optional[float]]:
+        cutoff = time.monotonic() - self.window
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        values = sorted(value for _, value in self._samples)
+        if not values:
+            return {q: None for q in QUANTILES}
+        # Nearest-rank quantiles
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+
+
+class Metrics:
+    """Process-wide timing spans, rolling histograms and counters.
+
+    Rendered in Prometheus text format for ``/metrics`` and as compact JSON
+    for ``/status``.
+    """
+
+    def __init__(self, namespace: str = "game_assistant", window: float = 300.0, max_samples: int = 2048):
+        self.namespace = namespace
+        self.window = window
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, RollingHistogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Callable[[], Dict[Labels, float]]] = {}
+
+    def observe(self, name: str, value: float, **labels: Any):
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = RollingHistogram(self.window, self.max_samples)
+            histogram.observe(value)
+
+    def increment(self, name: str, amount: float = 1, **labels: Any):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Time a block into the ``stage_seconds`` histogram, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage)
+
+    def gauge(self, name: str, read: Callable[[], Any], label: Optional[str] = None):
+        """Register a gauge read at scrape time.
+
+        ``read`` returns a number, or a dict of numbers keyed by the value of ``label``.
+        """
+        def collect() -> Dict[Labels, float]:
+            value = read()
+            if label is None:
+                return {(): value}
+            return {((label, str(k)),): v for k, v in value.items()}
+
+        with self._lock:
+            self._gauges[name] = collect
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+
+        def header(name: str, kind: str):
+            full = f"{self.namespace}_{name}"
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {full} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                full = header(name, "summary")
+                for labels, histogram in sorted(series.items()):
+                    for q, value in histogram.quantiles().items():
+                        rendered = "NaN" if value is None else repr(value)
+                        lines.append(f"{full}{_format_labels(labels, ('quantile', str(q)))} {rendered}")
+                    lines.append(f"{full}_sum{_format_labels(labels)} {histogram.sum!r}")
+                    lines.append(f"{full}_count{_format_labels(labels)} {histogram.count}")
+            for name, series in sorted(self._counters.items()):
+                full = header(name, "counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{full}{_format_labels(labels)} {value!r}")
+            gauges = list(self._gauges.items())
+
+        # Gauges read other components' state; don't hold our lock meanwhile
+        for name, collect in sorted(gauges):
+            try:
+                samples = collect()
+            except Exception as e:
+                print(f"Metrics gauge '{name}' failed: {e}")
+                continue
+            full = header(name, "gauge")
+            for labels, value in sorted(samples.items()):
+                lines.append(f"{full}{_format_labels(labels)} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, Any]:
+        """Compact JSON view: p50/p95/p99 per series (stage timings in ms) and counter totals."""
+        result: Dict[str, Any] = {}
+        with self._lock:
+            for name, series in self._histograms.items():
+                scale = 1000 if name.endswith("_seconds") else 1
+                out = result.setdefault(name.replace("_seconds", "_ms"), {})
+                for labels, histogram in series.items():
+                    key = ",".join(value for _, value in labels) or "all"
+                    entry = {'count': histogram.count}
+                    for q, value in histogram.quantiles().items():
+                        entry[f"p{int(q * 100)}"] = None if value is None else round(value * scale, 2)
+                    out[key] = entry
+            for name, series in self._counters.items():
+                result[name] = {",".join(value for _, value in labels) or "all": value
+                                for labels, value in series.items()}
+        return result
+
+
+metrics = Metrics()
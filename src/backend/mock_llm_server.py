@@ -0,0 +1,132 @@
+"""Deterministic OpenAI-compatible chat server for offline runs and load tests.
+
+Answers depend only on the request, so repeated runs produce identical
+output. Run standalone with ``python mock_llm_server.py --port 8090`` and
+point ``LLM_BASE_URL`` at ``http://127.0.0.1:8090/v1``.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+GAMES = ["Hollow Knight", "Elden Ring", "Stardew Valley", "Celeste", "The Witcher 3"]
+OBJECTIVES = [
+    "reach the next checkpoint",
+    "defeat the area boss",
+    "collect the missing key",
+    "talk to the merchant in town",
+    "finish the current quest",
+]
+
+
+def _text_of(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    # Multimodal content: keep the text parts, count the images
+    parts = [part.get("text", "") for part in content if part.get("type") == "text"]
+    images = sum(1 for part in content if part.get("type") == "image_url")
+    return " ".join(parts) + f" [{images} image(s)]"
+
+
+def mock_answer(messages: List[Dict[str, Any]]) -> str:
+    """A stable answer derived from the last user message."""
+    prompt = _text_of(messages[-1]["content"]) if messages else ""
+    digest = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+    game = GAMES[digest % len(GAMES)]
+    objective = OBJECTIVES[(digest // len(GAMES)) % len(OBJECTIVES)]
+    return f"Game: {game}\nThis is {game}. Your current objective is to {objective}."
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    latency = 0.0  # seconds before the first byte
+    token_delay = 0.0  # seconds between streamed chunks
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json({"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        messages = body.get("messages", [])
+        answer = mock_answer(messages)
+        usage = {
+            "prompt_tokens": max(1, len(json.dumps(messages)) // 4),
+            "completion_tokens": max(1, len(answer) // 4),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        time.sleep(self.latency)
+
+        if not body.get("stream"):
+            self._send_json({
+                "object": "chat.completion",
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        words = answer.split(" ")
+        for i, word in enumerate(words):
+            delta = {"content": word if i == 0 else f" {word}"}
+            chunk = {"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.token_delay)
+        final = {"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                 "usage": usage}
+        self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+
+    def _send_json(self, payload: Dict[str, Any]):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 8090, latency: float = 0.0,
+                      token_delay: float = 0.0) -> ThreadingHTTPServer:
+    """Serve the mock API on a background thread. ``port=0`` picks a free port."""
+    handler = type("ConfiguredMockLLMHandler", (MockLLMHandler,),
+                   {"latency": latency, "token_delay": token_delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-llm", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic OpenAI-compatible mock LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    args = parser.parse_args()
+
+    server = start_mock_server(args.host, args.port, args.latency, args.token_delay)
+    print(f"Mock LLM server listening on http://{args.host}:{server.server_port}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Collection, Dict, List, Optional, Tuple
+
+from metrics import metrics
+from resilience import deadline_scope
+
+
+@dataclass
+class StrategyResult:
+    """An answer produced by one strategy.
+
+    ``weak`` answers (e.g. a bare list of search result titles) are only used
+    when nothing better arrives before the deadline.
+    """
+    answer: str
+    weak: bool = False
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class PlanResult:
+    answer: str
+    source: str
+    elapsed: float
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+
+# A strategy receives a cancel event it should check between slow steps.
+Strategy = Callable[[threading.Event], Optional[StrategyResult]]
+
+
+class PendingPlan:
+    """Strategies already running for one query; ``result`` picks the answer."""
+
+    def __init__(self, futures: Dict[Future, str], rank: Dict[str, int], start: float,
+                 end: float, grace: float, cancel: threading.Event, primary: Collection[str]):
+        self.futures = futures
+        self.rank = rank
+        self.start = start
+        self.end = end
+        self.grace = grace
+        self._cancel = cancel
+        self.primary = {name for name in primary if name in rank}
+
+    def cancel(self):
+        """Stop waiting for the strategies: queued ones never start, running ones see the cancel event."""
+        self._cancel.set()
+        for future in self.futures:
+            future.cancel()
+
+    def result(self) -> Optional[PlanResult]:
+        """Wait for the best answer in time, or None if all strategies failed."""
+        futures, rank = self.futures, self.rank
+        strong: Dict[str, StrategyResult] = {}
+        weak: Dict[str, StrategyResult] = {}
+        pending = set(futures)
+        first_strong_at = 0.0
+        # Without primary strategies every answer counts from the start
+        primary_left = set(self.primary)
+        primary_done_at: Optional[float] = None if primary_left else self.start
+
+        try:
+            while pending:
+                now = time.monotonic()
+                wait_until = self.end
+                if strong:
+                    best = min(strong, key=rank.get)
+                    # Nothing more preferred can still arrive
+                    if all(rank[futures[f]] > rank[best] for f in pending):
+                        break
+                    # Fallback answers wait for the primary strategies; the grace
+                    # window only starts once they have all failed
+                    if primary_done_at is not None:
+                        wait_until = min(self.end, max(first_strong_at, primary_done_at) + self.grace)
+
+                # A zero timeout still collects answers that finished in time
+                done, pending = wait(pending, timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+                if not done and time.monotonic() >= wait_until:
+                    break
+                for future in done:
+                    name = futures[future]
+                    # Cancelled by a server shutdown: counts as failed
+                    result = None if future.cancelled() else future.result()
+                    if name in primary_left:
+                        primary_left.discard(name)
+                        if not primary_left:
+                            primary_done_at = time.monotonic()
+                    if not result or not result.answer:
+                        continue
+                    if result.weak:
+                        weak[name] = result
+                    else:
+                        if not strong:
+                            first_strong_at = time.monotonic()
+                        strong[name] = result
+        finally:
+            self.cancel()
+
+        chosen = strong or weak
+        if not chosen:
+            return None
+        name = min(chosen, key=rank.get)
+        result = chosen[name]
+        return PlanResult(
+            answer=result.answer,
+            source=name,
+            elapsed=time.monotonic() - self.start,
+            extra=result.extra,
+        )
+
+
+class QueryPlanner:
+    """Runs answer strategies concurrently and keeps the best one in time.
+
+    Strategies are given in preference order. The first strong answer wins,
+    but if it came from a less-preferred strategy the planner waits up to
+    ``grace`` seconds for a preferred one. ``primary`` strategies (reading
+    the screen) are ones the others only back up: their answers are held
+    until all of them fail, and the grace window starts from that point. Losers
+    are cancelled: queued ones never start and running ones see their
+    cancel event set. Network calls made by a strategy are bounded by the
+    query deadline.
+    """
+
+    def __init__(self, max_workers: int, grace: float):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query")
+        self.grace = grace
+        # Plans that may still have strategies queued or running, for shutdown
+        self._plans: "weakref.WeakSet[PendingPlan]" = weakref.WeakSet()
+
+    def run(self, strategies: List[Tuple[str, Strategy]], deadline: float,
+            primary: Collection[str] = ()) -> Optional[PlanResult]:
+        """Run strategies and return the chosen answer, or None if all failed."""
+        plan = self.start(strategies, deadline, primary)
+        return plan.result() if plan else None
+
+    def start(self, strategies: List[Tuple[str, Strategy]], deadline: float,
+              primary: Collection[str] = ()) -> Optional[PendingPlan]:
+        """Start strategies without waiting for them, e.g. to back up a streamed answer."""
+        if not strategies:
+            return None
+
+        start = time.monotonic()
+        end = start + deadline
+        cancel = threading.Event()
+        futures: Dict[Future, str] = {
+            self.executor.submit(self._guarded, name, strategy, cancel, end): name
+            for name, strategy in strategies
+        }
+        rank = {name: i for i, (name, _) in enumerate(strategies)}
+        plan = PendingPlan(futures, rank, start, end, self.grace, cancel, primary)
+        self._plans.add(plan)
+        return plan
+
+    @staticmethod
+    def _guarded(name: str, strategy: Strategy, cancel: threading.Event,
+                 deadline: float) -> Optional[StrategyResult]:
+        if cancel.is_set():
+            return None
+        try:
+            with deadline_scope(deadline), metrics.span(f"strategy_{name}"):
+                return strategy(cancel)
+        except Exception as e:
+            print(f"Query strategy '{name}' failed: {e}")
+            return None
+
+    def shutdown(self):
+        """Cancel outstanding strategies and stop the workers without waiting."""
+        for plan in list(self._plans):
+            plan.cancel()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,215 @@
+import email.utils
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterator, Optional
+
+import requests
+
+_local = threading.local()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose breaker is open."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the request budget ran out before a call could be made."""
+
+
+class StreamInterrupted(Exception):
+    """Raised when a streamed response fails after part of it was delivered."""
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]) -> Iterator[None]:
+    """Bound every resilient call on this thread by an absolute monotonic deadline.
+
+    Nested scopes can only tighten the budget. ``None`` leaves it unchanged,
+    which lets worker threads adopt a caller's ``current_deadline()`` as is.
+    """
+    previous = getattr(_local, "deadline", None)
+    if deadline is not None:
+        _local.deadline = deadline if previous is None else min(previous, deadline)
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def current_deadline() -> Optional[float]:
+    return getattr(_local, "deadline", None)
+
+
+def remaining_budget() -> Optional[float]:
+    deadline = current_deadline()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+@dataclass
+class RetryPolicy:
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0  # cap on backoff and on honored Retry-After values
+    retry_statuses: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number ``attempt`` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Stops calling a backend after repeated failures.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    calls fail immediately. Once ``reset_timeout`` has passed a single trial
+    call is let through (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self._lock = threading.Lock()
+        self.configure(failure_threshold, reset_timeout)
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.rejected = 0
+        self.trips = 0
+
+    def configure(self, failure_threshold: int, reset_timeout: float):
+        """Change the thresholds; the current state is kept."""
+        with self._lock:
+            self.failure_threshold = max(1, failure_threshold)
+            self.reset_timeout = reset_timeout
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = "half_open"
+            if self._state == "closed":
+                return True
+            if self._state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    self.trips += 1
+                self._state = "open"
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """End a call that says nothing about the backend's health."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return self._state
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            retry_in = None
+            if state == "open":
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+            return {
+                'state': state,
+                'failures': self._failures,
+                'trips': self.trips,
+                'rejected': self.rejected,
+                'retry_in': retry_in,
+            }
+
+
+def resilient_request(send: Callable[[float], requests.Response], policy: RetryPolicy,
+                      timeout: float, breaker: Optional[CircuitBreaker] = None) -> requests.Response:
+    """Call ``send(timeout)`` with retries, the thread's deadline and a circuit breaker.
+
+    Connection errors, timeouts and ``policy.retry_statuses`` are retried with
+    jittered backoff (or the server's Retry-After). Each attempt's timeout is
+    cut to the remaining request budget, and no retry is attempted that
+    couldn't finish in time. Other responses are returned as is; the last
+    retryable response is returned once retries are exhausted.
+    """
+    if breaker and not breaker.allow():
+        raise CircuitOpenError(f"{breaker.name} is unavailable (circuit open)")
+
+    attempt = 0
+    settled = False  # whether the breaker has been told how this call went
+    try:
+        while True:
+            budget = remaining_budget()
+            call_timeout = timeout if budget is None else min(timeout, budget)
+            if call_timeout <= 0:
+                raise DeadlineExceeded("request budget exhausted")
+
+            response = None
+            error: Optional[Exception] = None
+            retry_after = None
+            try:
+                response = send(call_timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                if response.status_code not in policy.retry_statuses:
+                    # 4xx answers are about the request, not the backend's health
+                    if breaker:
+                        breaker.record_success()
+                    settled = True
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+            attempt += 1
+            delay = policy.backoff(attempt) if retry_after is None else retry_after
+            budget = remaining_budget()
+            if attempt >= policy.attempts or delay > policy.max_delay or (budget is not None and delay >= budget):
+                if breaker:
+                    breaker.record_failure()
+                settled = True
+                if response is not None:
+                    return response
+                raise error
+
+            reason = f"HTTP {response.status_code}" if response is not None else type(error).__name__
+            print(f"Retrying after {reason} in {delay:.1f}s (attempt {attempt + 1}/{policy.attempts})")
+            if response is not None:
+                response.close()
+            time.sleep(delay)
+    finally:
+        # Out of budget or an unexpected error: don't leave a half-open trial hanging
+        if breaker and not settled:
+            breaker.release()
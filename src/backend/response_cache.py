@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a user query so trivially different phrasings share a key."""
+    query = re.sub(r"\s+", " ", query.lower()).strip()
+    return query.rstrip("?!. ")
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Build a stable cache key from arbitrary JSON-serializable parts."""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier LLM response cache: in-process LRU backed by SQLite.
+
+    Entries expire after ``ttl`` seconds in both tiers. The memory tier holds
+    at most ``max_entries`` items; the SQLite tier survives restarts so repeat
+    questions from an earlier session are answered without an API call.
+    """
+
+    def __init__(self, db_path: Optional[str], max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+                )
+                self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Response cache disk tier disabled: {e}")
+                self._db = None
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                created, value = item
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT value, created FROM responses WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"Response cache read error: {e}")
+                    row = None
+                if row and now - row[1] <= self.ttl:
+                    self._remember(key, row[1], row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str):
+        """Store a response in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                        (key, value, now),
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Response cache write error: {e}")
+
+    def _remember(self, key: str, created: float, value: str):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
@@ -0,0 +1,167 @@
+import re
+import shutil
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from frame_buffer import Frame
+from frame_similarity import content_hash
+from image_pipeline import Region, crop_region, resolve_regions
+from metrics import metrics
+
+# Questions that explicitly ask for the text on screen. Words like "quest" or
+# "menu" alone don't qualify: those questions usually need the image.
+TEXT_QUERY_PATTERN = re.compile(
+    r"\b(what (?:does|did|do) (?:it|this|that|they|the \w+(?: \w+)?) (?:say|read)|"
+    r"what(?:'s| is| was) written|read (?:out|me|it|this|that|the)\b|transcribe|"
+    r"what (?:does|do) (?:the )?(?:text|dialog(?:ue)?|subtitles?|sign|note|letter|message|tooltip)s? (?:say|mean))",
+    re.IGNORECASE,
+)
+
+
+def is_text_query(query: str) -> bool:
+    """Whether a query is about on-screen text rather than the visual scene."""
+    return bool(TEXT_QUERY_PATTERN.search(query))
+
+
+def preprocess_for_ocr(image: np.ndarray, min_height: int = 64) -> np.ndarray:
+    """Binarize an RGB crop into dark text on a light background."""
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+    # Tesseract struggles with small glyphs; HUD text is often only a few pixels tall
+    scale = 2 if gray.shape[0] < min_height * 4 else 1
+    if scale > 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Game UIs mostly draw light text on dark panels
+    if np.mean(binary) < 127:
+        binary = cv2.bitwise_not(binary)
+    return binary
+
+
+def run_tesseract(image: np.ndarray, command: str, language: str, timeout: float) -> str:
+    """OCR a preprocessed image with the tesseract binary, piping PNG bytes through stdin."""
+    ok, encoded = cv2.imencode(".png", image)
+    if not ok:
+        return ""
+    result = subprocess.run(
+        [command, "stdin", "stdout", "-l", language, "--psm", "6"],
+        input=encoded.tobytes(),
+        capture_output=True,
+        timeout=timeout,
+    )
+    if result.returncode != 0:
+        print(f"Tesseract error: {result.stderr.decode('utf-8', errors='replace').strip()}")
+        return ""
+    return re.sub(r"[ \t]+", " ", result.stdout.decode("utf-8", errors="replace")).strip()
+
+
+@dataclass
+class ScreenText:
+    """Text recognized in the regions of one frame."""
+    regions: Dict[str, str] = field(default_factory=dict)
+    elapsed_ms: float = 0.0
+    cached: int = 0
+
+    @property
+    def chars(self) -> int:
+        return sum(len(text) for text in self.regions.values())
+
+    def as_prompt(self) -> str:
+        return "\n".join(f"[{name}] {text}" for name, text in self.regions.items() if text)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'regions': [name for name, text in self.regions.items() if text],
+            'chars': self.chars,
+            'elapsed_ms': round(self.elapsed_ms, 2),
+            'cached_regions': self.cached,
+        }
+
+
+class ScreenTextReader:
+    """Optional OCR stage backed by a local Tesseract install.
+
+    Regions are recognized in parallel and the text of each is cached by an
+    exact hash of its pixels, so follow-up questions about the same screen
+    cost nothing while a changed line of dialog is read again.
+    ``available`` is False when the tesseract binary can't be found.
+    """
+
+    def __init__(self, command: str, language: str, timeout: float, cache_size: int, workers: int = 4):
+        self.command = shutil.which(command)
+        self.language = language
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr") if self.command else None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def available(self) -> bool:
+        return self.command is not None
+
+    def read(self, frame: Frame, region_names: List[str], known: Dict[str, Region]) -> Optional[ScreenText]:
+        """Recognize the text in the named regions of a frame."""
+        if not self.available:
+            return None
+        start = time.perf_counter()
+        result = ScreenText()
+        todo = []
+        for name, rect in resolve_regions(frame.image, region_names, known):
+            crop = crop_region(frame.image, rect)
+            key = content_hash(crop)
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+            if cached is not None:
+                result.regions[name] = cached
+                result.cached += 1
+            else:
+                todo.append((name, crop, key))
+
+        futures = [(name, key, self._executor.submit(self._read_region, crop))
+                   for name, crop, key in todo]
+        for name, key, future in futures:
+            try:
+                text = future.result()
+            except Exception as e:
+                print(f"OCR failed for region '{name}': {e}")
+                continue
+            result.regions[name] = text
+            with self._lock:
+                self.misses += 1
+                self._cache[key] = text
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        elapsed = time.perf_counter() - start
+        metrics.observe("stage_seconds", elapsed, stage="ocr")
+        result.elapsed_ms = elapsed * 1000
+        return result
+
+    def _read_region(self, crop: np.ndarray) -> str:
+        return run_tesseract(preprocess_for_ocr(crop), self.command, self.language, self.timeout)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'available': self.available,
+                'cached_regions': len(self._cache),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -1,9 +1,10 @@
 import os
 import time
+import queue
 import threading
+from collections import deque
 from datetime import datetime
-from typing import List, Optional
-import pyautogui
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
 from PIL import Image
 import cv2
 import numpy as np
@@ -11,107 +12,387 @@ import subprocess
 import sys
 
 from config import config
+from frame_buffer import Frame, FrameRingBuffer
+from frame_similarity import PROBE_SIZE, content_hash, dhash, is_near_duplicate, scene_change, scene_probe
+from metrics import metrics
+
+# (left, top, width, height) in screen pixels
+Rect = Tuple[int, int, int, int]
+
+# Settings the capture loop reads on every probe
+CAPTURE_SCHEDULE_SETTINGS = {
+    "SCREENSHOT_INTERVAL", "CAPTURE_PROBE_INTERVAL", "CAPTURE_PROBE_MAX_INTERVAL",
+    "CAPTURE_BACKOFF", "SCENE_CHANGE_THRESHOLD",
+}
+
+class CaptureBackend:
+    """Grabs screen pixels into an RGB NumPy array."""
+    name = "base"
+    
+    def grab(self, region: Optional[Rect] = None) -> Optional[np.ndarray]:
+        raise NotImplementedError
+    
+    def probe(self, region: Optional[Rect] = None, size: Tuple[int, int] = PROBE_SIZE) -> Optional[np.ndarray]:
+        """Tiny grayscale thumbnail of the screen for scene-change checks.
+        
+        Backends that can avoid converting the whole frame override this.
+        """
+        image = self.grab(region)
+        return None if image is None else scene_probe(image, size)
+    
+    def close(self):
+        pass
+
+class MSSCaptureBackend(CaptureBackend):
+    """Direct framebuffer grabs via MSS (XShm on Linux, GDI on Windows, CoreGraphics on macOS).
+    
+    Grabs a single monitor or a region without going through an encoded
+    image, which is far cheaper than a full-desktop PIL screenshot.
+    """
+    name = "mss"
+    
+    def __init__(self, monitor: int):
+        import mss
+        self._mss = mss
+        self.monitor = monitor
+        # MSS handles are not thread-safe, so each thread gets its own
+        self._local = threading.local()
+        self._handle()
+    
+    def _handle(self):
+        handle = getattr(self._local, "sct", None)
+        if handle is None:
+            handle = self._mss.mss()
+            self._local.sct = handle
+        return handle
+    
+    def _grab_bgra(self, region: Optional[Rect]) -> np.ndarray:
+        sct = self._handle()
+        if region:
+            left, top, width, height = region
+            area = {"left": left, "top": top, "width": width, "height": height}
+        else:
+            monitors = sct.monitors
+            area = monitors[self.monitor] if self.monitor < len(monitors) else monitors[1]
+        shot = sct.grab(area)
+        # A view of MSS's buffer; nothing is copied until it is converted
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+    
+    def grab(self, region: Optional[Rect] = None) -> Optional[np.ndarray]:
+        return cv2.cvtColor(self._grab_bgra(region), cv2.COLOR_BGRA2RGB)
+    
+    def probe(self, region: Optional[Rect] = None, size: Tuple[int, int] = PROBE_SIZE) -> Optional[np.ndarray]:
+        bgra = self._grab_bgra(region)
+        height, width = bgra.shape[:2]
+        # Sample every step-th pixel (still 4x the probe size) so a 4K frame is
+        # never converted or resized whole
+        step = max(1, min(width // (size[0] * 4), height // (size[1] * 4)))
+        small = np.ascontiguousarray(bgra[::step, ::step])
+        gray = cv2.cvtColor(small, cv2.COLOR_BGRA2GRAY)
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    
+    def close(self):
+        handle = getattr(self._local, "sct", None)
+        if handle is not None:
+            handle.close()
+            self._local.sct = None
+
+class PyAutoGUICaptureBackend(CaptureBackend):
+    name = "pyautogui"
+    
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+    
+    def grab(self, region: Optional[Rect] = None) -> Optional[np.ndarray]:
+        screenshot = self._pyautogui.screenshot(region=region) if region else self._pyautogui.screenshot()
+        if not screenshot:
+            return None
+        if screenshot.mode != "RGB":
+            screenshot = screenshot.convert("RGB")
+        return np.asarray(screenshot)
+
+class MacScreencaptureBackend(CaptureBackend):
+    """Fallback using the macOS ``screencapture`` tool and a temp PNG."""
+    name = "screencapture"
+    
+    def grab(self, region: Optional[Rect] = None) -> Optional[np.ndarray]:
+        # Use screencapture command which captures the actual screen content
+        temp_file = os.path.join(config.CACHE_DIR, f"temp_{int(time.time() * 1000)}.png")
+        
+        # Capture the full screen and crop afterwards.
+        # NOTE: Do NOT hardcode a region (-R). That breaks on Retina and multi-display.
+        cmd = [
+            'screencapture',
+            '-x',  # no sound
+            '-t', 'png',
+            temp_file
+        ]
+        
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+        
+        if result.returncode == 0 and os.path.exists(temp_file):
+            # Load the captured image
+            with Image.open(temp_file) as screenshot:
+                image = np.asarray(screenshot.convert("RGB"))
+            os.remove(temp_file)
+            if region:
+                left, top, width, height = region
+                image = image[top:top + height, left:left + width]
+            return image
+        
+        stderr = (result.stderr or '').strip()
+        if stderr:
+            print(f"screencapture failed: {stderr}")
+        else:
+            print("screencapture failed: unknown error")
+        
+        # Common cause: missing Screen Recording permission.
+        # macOS may refuse capture or return non-app content.
+        if 'Screen Recording' in stderr or 'not permitted' in stderr.lower() or 'not authorized' in stderr.lower():
+            print(
+                "Missing macOS Screen Recording permission for this process. "
+                "Enable it in System Settings > Privacy & Security > Screen Recording for the terminal/app running Python."
+            )
+        return None
+
+class ReplayCaptureBackend(CaptureBackend):
+    """Replays image files from a directory in a loop instead of grabbing the screen.
+    
+    For demos, benchmarks and debugging on machines without a display.
+    """
+    name = "replay"
+    extensions = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+    
+    def __init__(self, directory: Optional[str]):
+        if not directory or not os.path.isdir(directory):
+            raise ValueError(f"Replay directory not found: {directory}")
+        self.paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(self.extensions)
+        )
+        if not self.paths:
+            raise ValueError(f"No images to replay in {directory}")
+        self._images: dict = {}
+        self._next = 0
+        self._lock = threading.Lock()
+    
+    def grab(self, region: Optional[Rect] = None) -> Optional[np.ndarray]:
+        with self._lock:
+            path = self.paths[self._next % len(self.paths)]
+            self._next += 1
+            image = self._images.get(path)
+            if image is None:
+                with Image.open(path) as loaded:
+                    image = self._images[path] = np.asarray(loaded.convert("RGB"))
+        if region:
+            left, top, width, height = region
+            image = image[top:top + height, left:left + width]
+        return image.copy()
+
+def create_capture_backend(name: str) -> CaptureBackend:
+    """Create the named capture backend, or pick the best available for "auto".
+    
+    Subprocess-based capture is only used when nothing faster works.
+    """
+    factories = {
+        "mss": lambda: MSSCaptureBackend(config.CAPTURE_MONITOR),
+        "pyautogui": PyAutoGUICaptureBackend,
+        "screencapture": MacScreencaptureBackend,
+        "replay": lambda: ReplayCaptureBackend(config.CAPTURE_REPLAY_DIR),
+    }
+    if name != "auto":
+        return factories[name]()
+    
+    order = ["mss", "screencapture", "pyautogui"] if sys.platform == "darwin" else ["mss", "pyautogui"]
+    for candidate in order:
+        try:
+            backend = factories[candidate]()
+            print(f"Using {backend.name} capture backend")
+            return backend
+        except Exception as e:
+            print(f"Capture backend {candidate} unavailable: {e}")
+    raise RuntimeError("No screen capture backend available")
+
+class ScreenshotWriter:
+    """Persists frames to disk on a background thread."""
+
+    def __init__(self, on_saved=None):
+        self.on_saved = on_saved
+        self._queue: "queue.Queue[Optional[Frame]]" = queue.Queue(maxsize=config.MAX_SCREENSHOTS)
+        self._saved: Deque[str] = deque()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, frame: Frame) -> bool:
+        """Queue a frame for writing. Drops the frame if the writer is backed up."""
+        try:
+            self._queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            print(f"Screenshot writer busy, not persisting frame {frame.frame_id}")
+            return False
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(timeout=1)
+
+    def _run(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                return
+            try:
+                self._write(frame)
+            except Exception as e:
+                print(f"Error saving screenshot: {e}")
+
+    def _write(self, frame: Frame):
+        os.makedirs(config.SCREENSHOT_DIR, exist_ok=True)
+        timestamp = datetime.fromtimestamp(frame.timestamp).strftime("%Y%m%d_%H%M%S")
+        filepath = os.path.join(config.SCREENSHOT_DIR, f"screenshot_{timestamp}_{frame.frame_id}.png")
+        Image.fromarray(frame.image).save(filepath)
+
+        # Keep at most MAX_SCREENSHOTS files on disk
+        self._saved.append(filepath)
+        while len(self._saved) > config.MAX_SCREENSHOTS:
+            old_screenshot = self._saved.popleft()
+            if os.path.exists(old_screenshot):
+                os.remove(old_screenshot)
+
+        print(f"Screenshot saved: {filepath}")
+        if self.on_saved:
+            self.on_saved(frame.frame_id, filepath)
 
 class ScreenshotManager:
     def __init__(self):
-        self.screenshots: List[str] = []
+        self.frames = FrameRingBuffer(config.FRAME_BUFFER_MAX_BYTES, config.MAX_SCREENSHOTS)
+        self.writer: Optional[ScreenshotWriter] = None
         self.is_capturing = False
         self.capture_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        # Cuts the current probe wait short, on stop or when capture settings change
+        self._wake_event = threading.Event()
+        self._capture_lock = threading.Lock()
+        self.probe_interval = config.CAPTURE_PROBE_INTERVAL
+        self.last_change_score: Optional[float] = None
+        self.backend = create_capture_backend(config.CAPTURE_BACKEND)
+        self.capture_latencies: Deque[float] = deque(maxlen=50)
+        # Called with each newly stored frame (not for near-duplicates that replace the latest)
+        self.capture_listeners: List[Callable[[Frame], None]] = []
         self._ensure_directories()
+        if config.SCREENSHOT_PERSIST:
+            self.writer = ScreenshotWriter(on_saved=self.frames.set_path)
     
     def _ensure_directories(self):
         """Create necessary directories if they don't exist."""
-        os.makedirs(config.SCREENSHOT_DIR, exist_ok=True)
+        if config.SCREENSHOT_PERSIST:
+            os.makedirs(config.SCREENSHOT_DIR, exist_ok=True)
         os.makedirs(config.CACHE_DIR, exist_ok=True)
     
-    def take_screenshot(self) -> Optional[str]:
-        """Take a single screenshot and return the file path."""
+    def take_screenshot(self, skip_duplicates: bool = False) -> Optional[Frame]:
+        """Take a single screenshot and store it in the frame buffer.
+
+        With ``skip_duplicates`` a capture that looks the same as the latest
+        buffered frame overwrites it rather than taking a new slot.
+        """
+        image = self._grab_image()
+        if image is None:
+            print("Failed to capture screenshot")
+            return None
+        return self._store_image(image, skip_duplicates)
+    
+    def capture_if_stale(self, max_age: float) -> Optional[Frame]:
+        """Return the latest frame, capturing a new one if it is older than ``max_age`` seconds.
+
+        The new capture is always stored as is: frames that differ only in
+        small details (dialog text, a counter) hash alike, and the question
+        is usually about exactly those details.
+        """
+        latest = self.frames.latest()
+        if latest and time.time() - latest.timestamp <= max_age:
+            return latest
+        return self.take_screenshot() or latest
+    
+    def _grab_image(self) -> Optional[np.ndarray]:
+        """Grab the configured monitor or region as an RGB array."""
         try:
             # Directories may be deleted while the app is running.
             self._ensure_directories()
-
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"screenshot_{timestamp}.png"
-            filepath = os.path.join(config.SCREENSHOT_DIR, filename)
             
-            # Try macOS native screenshot first (better for capturing active windows)
-            if sys.platform == "darwin":
-                screenshot = self._take_macos_screenshot()
-            else:
-                # Fallback to pyautogui for other platforms
-                screenshot = pyautogui.screenshot()
-            
-            if screenshot:
-                screenshot.save(filepath, quality=config.SCREENSHOT_QUALITY)
-                
-                # Add to screenshots list and maintain max limit
-                self.screenshots.append(filepath)
-                if len(self.screenshots) > config.MAX_SCREENSHOTS:
-                    old_screenshot = self.screenshots.pop(0)
-                    if os.path.exists(old_screenshot):
-                        os.remove(old_screenshot)
-                
-                print(f"Screenshot saved: {filepath}")
-                return filepath
-            else:
-                print("Failed to capture screenshot")
-                return None
+            start = time.perf_counter()
+            image = self.backend.grab(config.CAPTURE_REGION)
+            elapsed = time.perf_counter() - start
+            self.capture_latencies.append(elapsed * 1000)
+            metrics.observe("stage_seconds", elapsed, stage="capture")
+            return image
             
         except Exception as e:
-            print(f"Error taking screenshot: {e}")
+            print(f"Error taking screenshot ({self.backend.name}): {e}")
+            return None
+    
+    def _probe_scene(self) -> Optional[np.ndarray]:
+        """Grab a scene-change thumbnail without keeping a full frame."""
+        try:
+            start = time.perf_counter()
+            probe = self.backend.probe(config.CAPTURE_REGION)
+            metrics.observe("stage_seconds", time.perf_counter() - start, stage="probe")
+            return probe
+        except Exception as e:
+            print(f"Error probing screen ({self.backend.name}): {e}")
             return None
     
-    def _take_macos_screenshot(self) -> Optional[Image.Image]:
-        """Take screenshot using macOS native tools for better quality."""
+    def capture_stats(self) -> dict:
+        """Capture backend name and recent grab latency in milliseconds."""
+        latencies = list(self.capture_latencies)
+        return {
+            'backend': self.backend.name,
+            'last_ms': round(latencies[-1], 2) if latencies else None,
+            'avg_ms': round(sum(latencies) / len(latencies), 2) if latencies else None,
+        }
+    
+    def _store_image(self, image: np.ndarray, skip_duplicates: bool,
+                     change_score: Optional[float] = None) -> Optional[Frame]:
+        """Hash a grabbed image and add it to the frame buffer."""
         try:
-            # Use screencapture command which captures the actual screen content
-            temp_file = os.path.join(config.CACHE_DIR, f"temp_{int(time.time())}.png")
+            with metrics.span("frame_store"):
+                phash = dhash(image)
+                # Cache keys need the exact hash; computing it here keeps it off the query path
+                digest = content_hash(image)
+                
+                frame = None
+                with self._capture_lock:
+                    if skip_duplicates:
+                        latest_hash = self.frames.latest_hash()
+                        if latest_hash is not None and is_near_duplicate(phash, latest_hash, config.FRAME_DEDUP_THRESHOLD):
+                            # Same scene: refresh the latest slot with the new pixels instead of using a new one
+                            frame = self.frames.replace_latest(image, phash=phash, change_score=change_score,
+                                                               digest=digest)
+                    replaced = frame is not None
+                    if not replaced:
+                        frame = self.frames.append(image, phash=phash, change_score=change_score, digest=digest)
             
-            # Capture the full screen.
-            # NOTE: Do NOT hardcode a region (-R). That breaks on Retina and multi-display.
-            cmd = [
-                'screencapture',
-                '-x',  # no sound
-                '-t', 'png',
-                temp_file
-            ]
+            # Disk writes happen off the capture thread, and only when enabled
+            if self.writer:
+                self.writer.submit(frame)
             
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+            if not replaced:
+                for listener in self.capture_listeners:
+                    listener(frame)
+            
+            return frame
             
-            if result.returncode == 0 and os.path.exists(temp_file):
-                # Load the captured image
-                screenshot = Image.open(temp_file)
-                screenshot.load()
-                os.remove(temp_file)
-                return screenshot
-            else:
-                stderr = (result.stderr or '').strip()
-                if stderr:
-                    print(f"screencapture failed: {stderr}")
-                else:
-                    print("screencapture failed: unknown error")
-
-                # Common cause: missing Screen Recording permission.
-                # macOS may refuse capture or return non-app content.
-                if 'Screen Recording' in stderr or 'not permitted' in stderr.lower() or 'not authorized' in stderr.lower():
-                    print(
-                        "Missing macOS Screen Recording permission for this process. "
-                        "Enable it in System Settings > Privacy & Security > Screen Recording for the terminal/app running Python."
-                    )
-                # Fallback to pyautogui
-                return pyautogui.screenshot()
-                
         except Exception as e:
-            print(f"macOS screenshot failed: {e}")
-            # Fallback to pyautogui
-            return pyautogui.screenshot()
+            print(f"Error storing screenshot: {e}")
+            return None
     
     def start_continuous_capture(self):
-        """Start capturing screenshots at regular intervals."""
+        """Start the adaptive capture loop."""
         if self.is_capturing:
             return
         
         self.is_capturing = True
+        self._stop_event.clear()
         self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
         self.capture_thread.start()
         print("Started continuous screenshot capture")
@@ -119,34 +400,83 @@ class ScreenshotManager:
     def stop_continuous_capture(self):
         """Stop continuous screenshot capture."""
         self.is_capturing = False
+        self._stop_event.set()
+        self._wake_event.set()
         if self.capture_thread:
             self.capture_thread.join(timeout=1)
         print("Stopped continuous screenshot capture")
     
+    def shutdown(self):
+        """Stop capturing and flush any pending disk writes."""
+        self.stop_continuous_capture()
+        if self.writer:
+            self.writer.stop()
+            self.writer = None
+        self.backend.close()
+    
     def _capture_loop(self):
-        """Main capture loop running in a separate thread."""
-        while self.is_capturing:
-            self.take_screenshot()
-            time.sleep(config.SCREENSHOT_INTERVAL)
+        """Main capture loop running in a separate thread.
+        
+        Probes the screen every ``probe_interval`` seconds and compares a tiny
+        thumbnail against the one from the last stored frame. Only a scene
+        change above SCENE_CHANGE_THRESHOLD (or SCREENSHOT_INTERVAL passing)
+        grabs and stores a full frame. The interval backs off while the scene is idle
+        and snaps back to the minimum as soon as something changes.
+        """
+        reference_probe = None
+        last_stored = 0.0
+        self.probe_interval = config.CAPTURE_PROBE_INTERVAL
+        
+        while not self._stop_event.is_set():
+            probe = self._probe_scene()
+            if probe is not None:
+                change = 1.0 if reference_probe is None else scene_change(reference_probe, probe)
+                self.last_change_score = change
+                overdue = time.time() - last_stored >= config.SCREENSHOT_INTERVAL
+                
+                if change >= config.SCENE_CHANGE_THRESHOLD or overdue:
+                    image = self._grab_image()
+                    if image is not None:
+                        self._store_image(image, skip_duplicates=True, change_score=change)
+                        reference_probe = probe
+                        last_stored = time.time()
+                    self.probe_interval = config.CAPTURE_PROBE_INTERVAL
+                else:
+                    self.probe_interval = min(
+                        self.probe_interval * config.CAPTURE_BACKOFF,
+                        config.CAPTURE_PROBE_MAX_INTERVAL
+                    )
+            
+            # Returns immediately when stopped or when the capture settings change
+            self._wake_event.wait(self.probe_interval)
+            self._wake_event.clear()
+    
+    def apply_config(self, changed: Dict[str, Any]):
+        """Pick up capture settings changed at runtime."""
+        if changed.keys() & CAPTURE_SCHEDULE_SETTINGS:
+            # Restart the backoff from the new probe interval instead of finishing an idle wait
+            self.probe_interval = config.CAPTURE_PROBE_INTERVAL
+            self._wake_event.set()
+        if "SCREENSHOT_PERSIST" in changed:
+            if config.SCREENSHOT_PERSIST and not self.writer:
+                self._ensure_directories()
+                self.writer = ScreenshotWriter(on_saved=self.frames.set_path)
+            elif not config.SCREENSHOT_PERSIST and self.writer:
+                writer, self.writer = self.writer, None
+                writer.stop()
     
-    def get_latest_screenshot(self) -> Optional[str]:
+    def get_latest_screenshot(self) -> Optional[Frame]:
         """Get the most recent screenshot."""
-        return self.screenshots[-1] if self.screenshots else None
+        return self.frames.latest()
+    
+    def get_key_frames(self) -> List[Frame]:
+        """The most informative frames of the last TEMPORAL_WINDOW seconds, oldest first."""
+        return self.frames.key_frames(config.TEMPORAL_FRAMES, config.TEMPORAL_WINDOW, config.FRAME_DEDUP_THRESHOLD)
     
-    def get_screenshot_for_analysis(self) -> Optional[str]:
+    def get_screenshot_for_analysis(self) -> Optional[Frame]:
         """Get the best screenshot for LLM analysis (most recent)."""
-        latest = self.get_latest_screenshot()
-        if latest and os.path.exists(latest):
-            return latest
-        return None
+        return self.get_latest_screenshot()
     
     def cleanup_old_screenshots(self):
-        """Remove old screenshots to free up space."""
-        current_time = time.time()
-        for screenshot in self.screenshots[:]:
-            if os.path.exists(screenshot):
-                file_age = current_time - os.path.getctime(screenshot)
-                # Remove screenshots older than 1 hour
-                if file_age > 3600:
-                    os.remove(screenshot)
-                    self.screenshots.remove(screenshot)
+        """Drop buffered screenshots older than 1 hour."""
+        self.frames.drop_older_than(3600)
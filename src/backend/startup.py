@@ -0,0 +1,108 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+
+class SubsystemUnavailable(Exception):
+    """Raised by an init function when its subsystem is switched off, e.g. no API key."""
+
+
+@dataclass
+class Subsystem:
+    name: str
+    init: Callable[[], None]
+    required: bool = True
+    state: str = "pending"  # pending, starting, ready, disabled or failed
+    detail: Optional[str] = None
+    elapsed_ms: Optional[float] = None
+    settled: threading.Event = field(default_factory=threading.Event)
+
+
+class StartupSequence:
+    """Initializes backend subsystems in order, off the request path.
+
+    The HTTP server can start answering as soon as this object exists; each
+    subsystem reports its own readiness, and handlers that need one wait for
+    it to settle. A subsystem whose init raises ``SubsystemUnavailable`` is
+    disabled rather than failed; only required subsystems must come up for
+    the backend to count as ready.
+    """
+
+    def __init__(self):
+        self._subsystems: Dict[str, Subsystem] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    def add(self, name: str, init: Callable[[], None], required: bool = True):
+        self._subsystems[name] = Subsystem(name, init, required)
+
+    def start(self):
+        """Run the init functions on a background thread."""
+        self._thread = threading.Thread(target=self.run, name="startup", daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """Run the init functions on the calling thread."""
+        self._started = time.perf_counter()
+        for subsystem in self._subsystems.values():
+            subsystem.state = "starting"
+            start = time.perf_counter()
+            try:
+                subsystem.init()
+                subsystem.state = "ready"
+            except SubsystemUnavailable as e:
+                subsystem.state = "disabled"
+                subsystem.detail = str(e)
+                print(f"⚠️  {subsystem.name} disabled: {e}")
+            except Exception as e:
+                subsystem.state = "failed"
+                subsystem.detail = str(e)
+                print(f"❌ {subsystem.name} failed to start: {e}")
+            subsystem.elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+            subsystem.settled.set()
+        self._finished = time.perf_counter()
+        print(f"✅ Startup finished in {(self._finished - self._started) * 1000:.0f} ms")
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> bool:
+        """Wait for a subsystem to settle; True if it came up."""
+        subsystem = self._subsystems[name]
+        subsystem.settled.wait(timeout)
+        return subsystem.state == "ready"
+
+    def wait_all(self, timeout: Optional[float] = None, names: Optional[List[str]] = None) -> bool:
+        """Wait for subsystems (default: all) to settle, whether or not they came up."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        subsystems = [self._subsystems[name] for name in names] if names else list(self._subsystems.values())
+        for subsystem in subsystems:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not subsystem.settled.wait(remaining):
+                return False
+        return True
+
+    def is_ready(self, name: str) -> bool:
+        return self._subsystems[name].state == "ready"
+
+    @property
+    def ready(self) -> bool:
+        """Whether startup finished and every required subsystem is up."""
+        return self.settled and all(s.state == "ready" for s in self._subsystems.values() if s.required)
+
+    @property
+    def settled(self) -> bool:
+        return all(s.settled.is_set() for s in self._subsystems.values())
+
+    def pending(self) -> List[str]:
+        return [s.name for s in self._subsystems.values() if not s.settled.is_set()]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            name: {
+                'state': s.state,
+                'required': s.required,
+                'elapsed_ms': s.elapsed_ms,
+                **({'detail': s.detail} if s.detail else {}),
+            }
+            for name, s in self._subsystems.items()
+        }
@@ -0,0 +1,49 @@
+import re
+import time
+from typing import List, Optional, Sequence, TypeVar
+
+from frame_similarity import is_near_duplicate
+
+# Questions about what happened over the last few seconds rather than the current screen
+TEMPORAL_QUERY_PATTERN = re.compile(
+    r"\b(just (?:now|happened)|what happened|earlier|ago|previous(?:ly)?|last (?:few|couple)|"
+    r"why did|how did i|what killed|died|killed me)\b",
+    re.IGNORECASE,
+)
+
+
+def is_temporal_query(query: str) -> bool:
+    """Whether a query needs recent frame history to answer."""
+    return bool(TEMPORAL_QUERY_PATTERN.search(query))
+
+
+# Anything with frame metadata: timestamp, change_score and phash
+F = TypeVar("F")
+
+
+def select_key_frames(frames: Sequence[F], count: int, window: float,
+                      dedup_threshold: int, now: Optional[float] = None) -> List[F]:
+    """Pick the most informative recent frames, oldest first.
+
+    The newest frame is always kept. The others are the frames from the last
+    ``window`` seconds with the highest scene-change score, skipping any that
+    look like a frame already chosen.
+    """
+    if not frames or count <= 0:
+        return []
+    now = time.time() if now is None else now
+    latest = max(frames, key=lambda frame: frame.timestamp)
+    recent = [frame for frame in frames if now - frame.timestamp <= window and frame is not latest]
+    # Biggest scene changes first; on ties the newer frame wins
+    recent.sort(key=lambda frame: (frame.change_score or 0.0, frame.timestamp), reverse=True)
+
+    chosen = [latest]
+    for frame in recent:
+        if len(chosen) >= count:
+            break
+        if frame.phash is not None and any(
+                other.phash is not None and is_near_duplicate(frame.phash, other.phash, dedup_threshold)
+                for other in chosen):
+            continue
+        chosen.append(frame)
+    return sorted(chosen, key=lambda frame: frame.timestamp)
@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for cache keys: lowercase host, no fragment."""
+    parts = urlsplit(url.strip())
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+@dataclass
+class CachedEntry:
+    value: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched: float
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.fetched <= ttl
+
+
+class WebCache:
+    """On-disk cache of search results and extracted page text.
+
+    Entries are grouped by ``kind`` ("search", "page", ...) and keep the
+    validators needed for conditional requests. Once the total stored size
+    exceeds ``max_bytes`` the least recently used entries are evicted.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "etag TEXT, last_modified TEXT, fetched REAL NOT NULL, "
+            "accessed REAL NOT NULL, size INTEGER NOT NULL, "
+            "PRIMARY KEY (kind, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._db.commit()
+
+    def get(self, kind: str, key: str) -> Optional[CachedEntry]:
+        """Look up an entry regardless of age; callers decide on freshness."""
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    "SELECT value, etag, last_modified, fetched FROM entries WHERE kind = ? AND key = ?",
+                    (kind, key),
+                ).fetchone()
+                if row is None:
+                    return None
+                self._db.execute(
+                    "UPDATE entries SET accessed = ? WHERE kind = ? AND key = ?", (time.time(), kind, key)
+                )
+                self._db.commit()
+                return CachedEntry(value=row[0], etag=row[1], last_modified=row[2], fetched=row[3])
+            except sqlite3.Error as e:
+                print(f"Web cache read error: {e}")
+                return None
+
+    def put(self, kind: str, key: str, value: str, etag: Optional[str] = None,
+            last_modified: Optional[str] = None):
+        now = time.time()
+        with self._lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries "
+                    "(kind, key, value, etag, last_modified, fetched, accessed, size) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (kind, key, value, etag, last_modified, now, now, len(value.encode("utf-8"))),
+                )
+                self._evict()
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Web cache write error: {e}")
+
+    def touch(self, kind: str, key: str):
+        """Mark an entry as freshly validated (e.g. after a 304 response)."""
+        now = time.time()
+        with self._lock:
+            try:
+                self._db.execute(
+                    "UPDATE entries SET fetched = ?, accessed = ? WHERE kind = ? AND key = ?",
+                    (now, now, kind, key),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Web cache write error: {e}")
+
+    def record(self, outcome: str):
+        """Count a lookup outcome: "hit", "revalidated" or "miss"."""
+        with self._lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "revalidated":
+                self.revalidated += 1
+            else:
+                self.misses += 1
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        while total > self.max_bytes:
+            row = self._db.execute(
+                "SELECT kind, key, size FROM entries ORDER BY accessed ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM entries WHERE kind = ? AND key = ?", (row[0], row[1]))
+            total -= row[2]
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            try:
+                count, size = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+            except sqlite3.Error:
+                count, size = None, None
+            return {
+                "entries": count,
+                "bytes": size,
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
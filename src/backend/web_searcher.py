@@ -1,17 +1,60 @@
 import requests
 import re
-from typing import List, Dict, Optional
-from urllib.parse import quote, urlparse
+import os
+import json
+import codecs
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
+from typing import Any, Callable, List, Dict, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlparse
 import time
 
+from concurrency import pooled_session
 from config import config
+from guide_index import GuideIndex, Passage
+from html_text import HTMLTextExtractor
+from metrics import metrics
+from resilience import (
+    CircuitBreaker, RetryPolicy, current_deadline, deadline_scope, remaining_budget, resilient_request
+)
+from response_cache import normalize_query
+from web_cache import WebCache, normalize_url
 
 class WebSearcher:
     def __init__(self):
-        self.session = requests.Session()
+        self.session = pooled_session(config.HTTP_POOL_SIZE)
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        self.cache = WebCache(
+            os.path.join(config.CACHE_DIR, "web_cache.sqlite3"),
+            max_bytes=config.WEB_CACHE_MAX_BYTES
+        )
+        self.index = GuideIndex(
+            os.path.join(config.CACHE_DIR, "guide_index.sqlite3"),
+            passage_chars=config.PASSAGE_CHARS,
+            max_bytes=config.GUIDE_INDEX_MAX_BYTES
+        )
+        self.breaker = CircuitBreaker("search", config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_TIMEOUT)
+        self.retry_policy = RetryPolicy(config.RETRY_ATTEMPTS, config.RETRY_BASE_DELAY, config.RETRY_MAX_DELAY)
+        self.fetch_pool = ThreadPoolExecutor(max_workers=config.FETCH_WORKERS, thread_name_prefix="fetch")
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._host_slots_lock = threading.Lock()
+    
+    def apply_config(self, changed: Dict[str, Any]):
+        """Pick up settings changed at runtime; timeouts and TTLs are read per request already."""
+        if "WEB_CACHE_MAX_BYTES" in changed:
+            self.cache.max_bytes = config.WEB_CACHE_MAX_BYTES
+        if "GUIDE_INDEX_MAX_BYTES" in changed:
+            self.index.max_bytes = config.GUIDE_INDEX_MAX_BYTES
+        if "FETCH_PER_HOST" in changed:
+            # Fetches in flight keep their old slots; new ones get the new limit
+            with self._host_slots_lock:
+                self._host_slots.clear()
+        if changed.keys() & {"RETRY_ATTEMPTS", "RETRY_BASE_DELAY", "RETRY_MAX_DELAY"}:
+            self.retry_policy = RetryPolicy(config.RETRY_ATTEMPTS, config.RETRY_BASE_DELAY, config.RETRY_MAX_DELAY)
+        if changed.keys() & {"BREAKER_FAILURE_THRESHOLD", "BREAKER_RESET_TIMEOUT"}:
+            self.breaker.configure(config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_TIMEOUT)
     
     def search_game_hints(self, query: str, game_name: Optional[str] = None) -> List[Dict[str, str]]:
         """Search for game hints and walkthroughs."""
@@ -30,20 +73,33 @@ class WebSearcher:
     
     def _duckduckgo_search(self, query: str) -> List[Dict[str, str]]:
         """Perform search using DuckDuckGo."""
+        cache_key = normalize_query(query)
+        cached = self.cache.get("search", cache_key)
+        if cached and cached.is_fresh(config.SEARCH_CACHE_TTL):
+            self.cache.record("hit")
+            return json.loads(cached.value)
+        self.cache.record("miss")
+        
         try:
             # DuckDuckGo instant answer API
-            url = "https://duckduckgo.com/html/"
+            url = config.SEARCH_URL
             params = {
                 'q': query,
                 'kl': 'us-en'
             }
             
-            response = self.session.get(url, params=params, timeout=config.SEARCH_TIMEOUT)
+            with metrics.span("search"):
+                response = resilient_request(
+                    lambda timeout: self.session.get(url, params=params, timeout=timeout),
+                    self.retry_policy, config.SEARCH_TIMEOUT, self.breaker
+                )
             response.raise_for_status()
             
             # Parse HTML results
-            results = self._parse_duckduckgo_results(response.text)
-            return results[:config.MAX_SEARCH_RESULTS]
+            results = self._parse_duckduckgo_results(response.text)[:config.MAX_SEARCH_RESULTS]
+            if results:
+                self.cache.put("search", cache_key, json.dumps(results))
+            return results
             
         except Exception as e:
             print(f"Search error: {e}")
@@ -61,11 +117,13 @@ class WebSearcher:
         result_matches = re.findall(result_pattern, html, re.DOTALL)
         
         for i, (url, title) in enumerate(result_matches[:config.MAX_SEARCH_RESULTS]):
-            # Clean up the URL and title
-            url = url.replace('/l/?uddg=', '').split('&')[0]
+            # Result links go through DuckDuckGo's redirector with the target URL-encoded in uddg
+            redirect = parse_qs(urlparse(url).query).get('uddg')
+            if redirect:
+                url = redirect[0]
             title = re.sub(r'<[^>]*>', '', title).strip()
             
-            if url and title and not url.startswith('/'):
+            if url and title and url.startswith(('http://', 'https://')):
                 results.append({
                     'title': title,
                     'url': url,
@@ -74,42 +132,203 @@ class WebSearcher:
         
         return results
     
-    def get_page_content(self, url: str) -> Optional[str]:
-        """Get text content from a webpage."""
+    def get_page_content(self, url: str, should_stop: Optional[Callable[[], bool]] = None) -> Optional[str]:
+        """Get text content from a webpage.
+        
+        Extracted text is cached on disk. Stale entries are revalidated with
+        If-None-Match / If-Modified-Since so unchanged pages cost a 304.
+        ``should_stop`` is polled while downloading; when it returns True the
+        fetch is abandoned and None is returned.
+        """
+        cache_key = normalize_url(url)
+        cached = self.cache.get("page", cache_key)
+        if cached and cached.is_fresh(config.PAGE_CACHE_TTL):
+            self.cache.record("hit")
+            return cached.value
+        
+        headers = {}
+        if cached:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        
+        start = time.perf_counter()
         try:
-            response = self.session.get(url, timeout=config.SEARCH_TIMEOUT)
-            response.raise_for_status()
-            
-            # Simple text extraction
-            content = response.text
+            # Guide sites are many independent hosts, so they share retries but not a breaker
+            response = resilient_request(
+                lambda timeout: self.session.get(url, headers=headers, timeout=timeout, stream=True),
+                self.retry_policy, config.SEARCH_TIMEOUT
+            )
+            metrics.observe("stage_seconds", time.perf_counter() - start, stage="page_response")
+            with response:
+                if cached and response.status_code == 304:
+                    self.cache.touch("page", cache_key)
+                    self.cache.record("revalidated")
+                    return cached.value
+                response.raise_for_status()
+                self.cache.record("miss")
+                
+                content_type = response.headers.get('Content-Type', 'text/html')
+                if 'html' not in content_type and 'text/plain' not in content_type:
+                    print(f"Skipping non-HTML page ({content_type}): {url}")
+                    return None
+                
+                # Downloading the body and extracting its text are interleaved
+                with metrics.span("page_extract"):
+                    content = self._extract_text(response, should_stop)
             
-            # Remove HTML tags (basic)
-            content = re.sub(r'<script[^>]*>.*?</script>', '', content, flags=re.DOTALL)
-            content = re.sub(r'<style[^>]*>.*?</style>', '', content, flags=re.DOTALL)
-            content = re.sub(r'<[^>]*>', ' ', content)
-            content = re.sub(r'\s+', ' ', content)
-            
-            # Return first 2000 characters
-            return content[:2000].strip()
+            if content is None:
+                return None
+            if content:
+                self.cache.put(
+                    "page", cache_key, content,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified')
+                )
+            return content
             
         except Exception as e:
             print(f"Error fetching page content: {e}")
             return None
     
+    def _extract_text(self, response: requests.Response,
+                      should_stop: Optional[Callable[[], bool]] = None) -> Optional[str]:
+        """Stream a page body through the HTML extractor, stopping early.
+        
+        Reading stops once PAGE_MAX_CHARS of text have been extracted or
+        PAGE_MAX_BYTES have been downloaded, so large wiki pages are never
+        held in memory whole.
+        """
+        # requests falls back to ISO-8859-1 when no charset is declared; most pages are UTF-8
+        encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '') else 'utf-8'
+        try:
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        
+        extractor = HTMLTextExtractor()
+        bytes_read = 0
+        for chunk in response.iter_content(chunk_size=config.PAGE_CHUNK_BYTES):
+            if should_stop and should_stop():
+                return None
+            bytes_read += len(chunk)
+            extractor.feed(decoder.decode(chunk))
+            if extractor.char_count >= config.PAGE_MAX_CHARS or bytes_read >= config.PAGE_MAX_BYTES:
+                break
+        extractor.feed(decoder.decode(b'', final=True))
+        extractor.close()
+        
+        return extractor.get_text()[:config.PAGE_MAX_CHARS]
+    
+    def index_page(self, result: Dict[str, str], game_name: Optional[str] = None,
+                   should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        """Fetch a search result and add its passages to the guide index.
+        
+        Pages indexed within PAGE_CACHE_TTL are reused as is; older ones are
+        fetched again, which costs a 304 when the page hasn't changed.
+        """
+        url = normalize_url(result['url'])
+        if self.index.has_page(url, max_age=config.PAGE_CACHE_TTL):
+            self.index.tag_page(url, game_name)
+            return True
+        content = self.get_page_content(result['url'], should_stop)
+        if not content:
+            return False
+        return self.index.add_page(url, result.get('title', ''), content, game_name) > 0
+    
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc.lower()
+        with self._host_slots_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(config.FETCH_PER_HOST)
+            return self._host_slots[host]
+    
+    def fetch_first_relevant(self, results: List[Dict[str, str]], query: str,
+                             game_name: Optional[str] = None,
+                             should_stop: Optional[Callable[[], bool]] = None
+                             ) -> Optional[Tuple[Dict[str, str], List[Passage]]]:
+        """Fetch result pages concurrently and return the first with relevant passages.
+        
+        A page matches when one of its passages contains at least
+        PASSAGE_MIN_COVERAGE of the query's significant terms. Remaining
+        fetches are cancelled as soon as a page matches, so the worst case is
+        one SEARCH_TIMEOUT rather than one per result.
+        """
+        found = threading.Event()
+        # Fetch threads inherit the caller's request budget
+        deadline = current_deadline()
+        budget = remaining_budget()
+        wait_timeout = config.SEARCH_TIMEOUT if budget is None else max(0.0, min(config.SEARCH_TIMEOUT, budget))
+        
+        def stopped() -> bool:
+            return found.is_set() or bool(should_stop and should_stop())
+        
+        def fetch(result: Dict[str, str]) -> Optional[List[Passage]]:
+            slot = self._host_slot(result['url'])
+            if not slot.acquire(timeout=config.SEARCH_TIMEOUT):
+                return None
+            try:
+                with deadline_scope(deadline):
+                    if stopped() or not self.index_page(result, game_name, stopped):
+                        return None
+            finally:
+                slot.release()
+            # A page only counts if it covers the question, not just one of its words
+            return self.find_passages(query, game_name, url=result['url'])
+        
+        futures = {self.fetch_pool.submit(fetch, result): result for result in results}
+        try:
+            for future in as_completed(futures, timeout=wait_timeout):
+                passages = future.result()
+                if passages:
+                    return futures[future], passages
+                if should_stop and should_stop():
+                    break
+        except TimeoutError:
+            print(f"Guide fetch timed out after {wait_timeout:.1f}s")
+        finally:
+            found.set()
+            for future in futures:
+                future.cancel()
+        return None
+    
+    def find_passages(self, query: str, game_name: Optional[str] = None,
+                      k: Optional[int] = None, url: Optional[str] = None,
+                      min_coverage: Optional[float] = None) -> List[Passage]:
+        """Best matching guide passages already in the local index.
+        
+        Passages must contain PASSAGE_MIN_COVERAGE of the query's significant
+        terms, so a cached guide only answers questions it is actually about.
+        """
+        if min_coverage is None:
+            min_coverage = config.PASSAGE_MIN_COVERAGE
+        with metrics.span("guide_lookup"):
+            return self.index.search(
+                query, game_name, k or config.PASSAGE_TOP_K,
+                url=normalize_url(url) if url else None, min_coverage=min_coverage
+            )
+    
+    @staticmethod
+    def format_passages(passages: List[Passage]) -> str:
+        return "\n\n".join(f"{p.text}\n— {p.title}" for p in passages)
+    
     def search_specific_game_guide(self, game_name: str, specific_query: str) -> Optional[str]:
         """Search for specific game guide and extract relevant information."""
+        passages = self.find_passages(specific_query, game_name, k=1)
+        if passages:
+            return f"From {passages[0].title}: {passages[0].text}"
+        
         query = f"{game_name} {specific_query} guide walkthrough"
         results = self.search_game_hints(query, game_name)
         
         if not results:
             return None
         
-        # Try to get content from the first few results
-        for result in results[:3]:
-            content = self.get_page_content(result['url'])
-            if content:
-                # Simple relevance check
-                if any(term in content.lower() for term in specific_query.lower().split()):
-                    return f"From {result['title']}: {content[:500]}..."
+        # Fetch the first few results in parallel; the first relevant page wins
+        match = self.fetch_first_relevant(results[:config.FETCH_TOP_N], specific_query, game_name)
+        if match:
+            result, passages = match
+            return f"From {result['title']}: {passages[0].text}"
         
         return f"Found relevant guides: {', '.join([r['title'] for r in results[:3]])}"
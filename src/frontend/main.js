@@ -7,6 +7,7 @@ let tray;
 let isDev = process.argv.includes('--dev');
 let pythonProcess;
 let screenshotInterval;
+let eventStreamRetry;
 
 // Configuration
 const config = {
@@ -164,11 +165,84 @@ function startPythonBackend() {
   });
 }
 
+// Parse a server-sent event stream, calling onEvent(name, data) per event.
+function readEventStream(stream, onEvent) {
+  return new Promise((resolve, reject) => {
+    let buffer = '';
+
+    stream.setEncoding('utf8');
+    stream.on('data', (chunk) => {
+      buffer += chunk;
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let name = 'message';
+        const dataLines = [];
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event:')) {
+            name = line.slice(6).trim();
+          } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+          }
+        }
+        if (dataLines.length === 0) continue;
+
+        try {
+          onEvent(name, JSON.parse(dataLines.join('\n')));
+        } catch (e) {
+          console.error('Bad event from backend:', e);
+        }
+      }
+    });
+    stream.on('end', resolve);
+    stream.on('error', reject);
+  });
+}
+
+// Subscribe to backend push events and forward them to the renderer.
+// Reconnects automatically, since the backend may still be starting up.
+async function connectEventStream() {
+  clearTimeout(eventStreamRetry);
+  try {
+    const response = await axios.get('http://127.0.0.1:8080/events', {
+      responseType: 'stream'
+    });
+    await readEventStream(response.data, (name, data) => {
+      if (mainWindow) {
+        mainWindow.webContents.send('backend-event', { type: name, data });
+      }
+    });
+  } catch (error) {
+    if (isDev) {
+      console.log(`Event stream unavailable: ${error.message}`);
+    }
+  }
+
+  if (!app.isQuitting) {
+    eventStreamRetry = setTimeout(connectEventStream, 2000);
+  }
+}
+
 // IPC Handlers
 ipcMain.handle('process-query', async (event, query) => {
   try {
-    const response = await axios.post('http://127.0.0.1:8080/query', { query });
-    return response.data;
+    // Stream tokens to the renderer as they arrive; resolve with the final answer.
+    const response = await axios.post('http://127.0.0.1:8080/query/stream', { query }, {
+      responseType: 'stream'
+    });
+
+    let result = null;
+    await readEventStream(response.data, (name, data) => {
+      if (name === 'token') {
+        event.sender.send('query-chunk', data.text);
+      } else if (name === 'done' || name === 'error') {
+        result = data;
+      }
+    });
+
+    return result || { error: 'Query stream ended unexpectedly' };
   } catch (error) {
     console.error('Query error:', error);
     return { error: 'Failed to process query' };
@@ -215,8 +289,39 @@ ipcMain.handle('close-window', () => {
   }
 });
 
+// Overlay settings the backend also uses, plus any raw backend settings
+// passed as `settings.backend` (e.g. { MODEL_NAME: 'gpt-4o', MAX_TOKENS: 800 })
+function backendSettingsFor(settings) {
+  const changes = { ...(settings.backend || {}) };
+  if (settings.screenshotInterval !== undefined) {
+    changes.SCREENSHOT_INTERVAL = Math.round(settings.screenshotInterval / 1000);
+  }
+  if (settings.overlayOpacity !== undefined) {
+    changes.OVERLAY_OPACITY = settings.overlayOpacity;
+  }
+  return changes;
+}
+
 ipcMain.handle('update-settings', async (event, settings) => {
-  Object.assign(config, settings);
+  // The backend applies changes live; invalid values are rejected before anything changes
+  const changes = backendSettingsFor(settings);
+  let backendApplied = false;
+  if (Object.keys(changes).length) {
+    try {
+      await axios.post('http://127.0.0.1:8080/config', changes);
+      backendApplied = true;
+    } catch (error) {
+      if (error.response && error.response.status === 400) {
+        const { error: message, errors } = error.response.data;
+        return { success: false, error: message, errors };
+      }
+      // Backend not reachable: still apply the overlay's own settings
+      console.error('Could not update backend settings:', error.message);
+    }
+  }
+
+  const { backend, ...overlaySettings } = settings;
+  Object.assign(config, overlaySettings);
   if (mainWindow) {
     mainWindow.setOpacity(config.overlayOpacity);
     if (config.alwaysOnTop) {
@@ -225,7 +330,7 @@ ipcMain.handle('update-settings', async (event, settings) => {
       mainWindow.setAlwaysOnTop(false);
     }
   }
-  return { success: true };
+  return { success: true, backendApplied };
 });
 
 ipcMain.handle('get-settings', () => {
@@ -237,6 +342,7 @@ app.whenReady().then(() => {
   createTray();
   setupGlobalShortcuts();
   startPythonBackend();
+  connectEventStream();
 });
 
 app.on('activate', () => {
@@ -254,6 +360,8 @@ app.on('window-all-closed', () => {
 });
 
 app.on('will-quit', () => {
+  app.isQuitting = true;
+  clearTimeout(eventStreamRetry);
   globalShortcut.unregisterAll();
   if (pythonProcess) {
     pythonProcess.kill();
@@ -16,6 +16,8 @@ contextBridge.exposeInMainWorld('electronAPI', {
   // Events
   onTakeScreenshot: (callback) => ipcRenderer.on('take-screenshot', callback),
   onOpenSettings: (callback) => ipcRenderer.on('open-settings', callback),
+  onQueryChunk: (callback) => ipcRenderer.on('query-chunk', callback),
+  onBackendEvent: (callback) => ipcRenderer.on('backend-event', callback),
   
   // Remove listeners
   removeAllListeners: (channel) => ipcRenderer.removeAllListeners(channel)
@@ -16,15 +16,19 @@ echo "🚀 Starting Python backend..."
 python3 src/backend/backend_server.py &
 BACKEND_PID=$!
 
-# Wait a moment for backend to start
-sleep 2
-
-# Check if backend is running
-if ! curl -s http://localhost:8080/health > /dev/null; then
-    echo "❌ Backend failed to start"
-    kill $BACKEND_PID 2>/dev/null
-    exit 1
-fi
+# The backend answers /health as soon as it is listening; capture, the LLM
+# client and search keep starting in the background
+for attempt in $(seq 1 50); do
+    if curl -s http://localhost:8080/health > /dev/null; then
+        break
+    fi
+    if ! kill -0 $BACKEND_PID 2>/dev/null || [ "$attempt" -eq 50 ]; then
+        echo "❌ Backend failed to start"
+        kill $BACKEND_PID 2>/dev/null
+        exit 1
+    fi
+    sleep 0.1
+done
 
 echo "✅ Backend started successfully"
 